@@ -0,0 +1,130 @@
+"""
+多任务批量运行
+在同一进程中依次运行任务文件中列出的多个任务（各自的配置文件与覆盖项），
+字体与背景模板在任务之间共享，只加载一次；结束时汇总每个任务与总耗时。
+
+任务文件示例（jobs.json）：
+{
+    "defaults": {"config": "config.json"},
+    "jobs": [
+        {"name": "vip", "overrides": {"output_dir": "output/vip", "font_settings": {"color": [255, 215, 0]}}},
+        {"name": "staff", "overrides": {"excel_file": "data/Staff.xlsx", "output_dir": "output/staff"}}
+    ]
+}
+"""
+
+import json
+import time
+import logging
+
+from id_fill_generator import IDFillGenerator, merge_config
+from resource_cache import ResourceCache
+
+logger = logging.getLogger(__name__)
+
+
+def load_job_file(job_path):
+    """
+    读取并校验任务文件。
+
+    - 顶层可以是任务列表，或包含 jobs（及可选 defaults）的字典
+    - 每个任务可包含 name、config（默认 config.json）、overrides（覆盖配置字段）
+    - defaults 中的字段作为每个任务的默认值（overrides 按键合并）
+
+    Args:
+        job_path (str): 任务文件路径
+
+    Returns:
+        list[dict]: 规范化后的任务列表，每项包含 name/config/overrides
+    """
+    with open(job_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if isinstance(data, list):
+        data = {'jobs': data}
+    if not isinstance(data, dict) or not isinstance(data.get('jobs'), list) or not data['jobs']:
+        raise ValueError(f"任务文件无效: {job_path} 必须包含非空的 jobs 列表")
+
+    defaults = data.get('defaults') or {}
+    jobs = []
+    for number, item in enumerate(data['jobs'], 1):
+        if not isinstance(item, dict):
+            raise ValueError(f"任务文件无效: 第 {number} 个任务必须为字典")
+        job = merge_config(defaults, item)
+        overrides = job.get('overrides') or {}
+        if not isinstance(overrides, dict):
+            raise ValueError(f"任务文件无效: 第 {number} 个任务的 overrides 必须为字典")
+        jobs.append({
+            'name': str(job.get('name') or f"job{number}"),
+            'config': job.get('config', 'config.json'),
+            'overrides': overrides,
+        })
+    return jobs
+
+
+def run_jobs(jobs, resources=None):
+    """
+    依次运行多个任务；单个任务失败不会中断后续任务。
+
+    Args:
+        jobs (list[dict]): 任务列表（load_job_file 的返回值）
+        resources (ResourceCache): 共享资源缓存；缺省时新建
+
+    Returns:
+        list[dict]: 每个任务的结果，包含 name/images/seconds/error
+    """
+    resources = resources or ResourceCache()
+    results = []
+    for number, job in enumerate(jobs, 1):
+        logger.info(f"=== 任务 {number}/{len(jobs)}: {job['name']} ===")
+        start = time.perf_counter()
+        result = {'name': job['name'], 'images': 0, 'seconds': 0.0, 'error': None}
+        try:
+            generator = IDFillGenerator(job['config'], overrides=job['overrides'], resources=resources)
+            result['images'] = generator.generate_all_images()
+        except Exception as e:
+            logger.error(f"任务 {job['name']} 失败: {e}")
+            result['error'] = str(e)
+        result['seconds'] = time.perf_counter() - start
+        results.append(result)
+    return results
+
+
+def format_summary(results, total_seconds, resources):
+    """
+    生成任务耗时汇总文本。
+
+    Args:
+        results (list[dict]): run_jobs 的返回值
+        total_seconds (float): 总耗时（秒）
+        resources (ResourceCache): 共享资源缓存（用于显示加载次数）
+
+    Returns:
+        str: 汇总文本
+    """
+    lines = ["=== 任务汇总 ==="]
+    for r in results:
+        status = "失败: " + r['error'] if r['error'] else "完成"
+        rate = f"{r['images'] / r['seconds']:.1f} 张/秒" if r['seconds'] > 0 and r['images'] else "-"
+        lines.append(f"{r['name']}: {r['images']} 张, {r['seconds']:.2f}s, {rate}, {status}")
+    total_images = sum(r['images'] for r in results)
+    lines.append(f"合计: {len(results)} 个任务, {total_images} 张, {total_seconds:.2f}s")
+    lines.append(f"共享资源: 背景加载 {resources.background_loads} 次, 字体句柄 {resources.font_count()} 个")
+    return "\n".join(lines)
+
+
+def main(job_path):
+    """
+    运行任务文件并打印汇总。
+
+    Args:
+        job_path (str): 任务文件路径
+
+    Returns:
+        int: 失败的任务数量
+    """
+    start = time.perf_counter()
+    resources = ResourceCache()
+    results = run_jobs(load_job_file(job_path), resources)
+    print(format_summary(results, time.perf_counter() - start, resources))
+    return sum(1 for r in results if r['error'])
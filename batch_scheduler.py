@@ -0,0 +1,138 @@
+"""
+批量调度模块
+多进程生成时，先把渲染行按样式档案分组、组内按文字长度排序（相邻任务使用同一字体文件、描边设置与相近字号，
+字体句柄缓存命中率高），再切成小块按估算开销从大到小分发给工作进程，避免并行运行末尾只剩一个长任务在跑。
+输出文件名在调度前按原始行号确定，NNN_ 编号与顺序生成完全一致。
+"""
+
+import logging
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+# 单行的固定开销（复制背景、编码与写盘，与文字无关），以“字符当量”计
+ROW_BASE_COST = 20
+
+# 每个工作进程平均分到的任务块数量（块越多负载越均衡，块越少调度开销越低）
+CHUNKS_PER_WORKER = 8
+
+# 自动确定的任务块大小上限
+MAX_CHUNK_SIZE = 64
+
+# 工作进程内的生成器（由 _init_worker 创建）
+_worker_generator = None
+
+
+def resolve_worker_count(value):
+    """
+    解析配置中的 workers 字段。
+
+    Args:
+        value (int | str): 工作进程数；"auto" 表示 CPU 核心数
+
+    Returns:
+        int: 工作进程数（1 表示在当前进程中顺序生成）
+    """
+    if value == 'auto':
+        return max(1, multiprocessing.cpu_count())
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError(f"配置无效: workers 必须为正整数或 auto，当前为 {value}")
+    return value
+
+
+def estimate_cost(user_id, profile):
+    """
+    估算一行的相对生成开销：固定开销 + 字数 x (1 + 描边宽度)（描边文字需要额外光栅化描边轮廓）。
+
+    Args:
+        user_id (str): 用户ID
+        profile (StyleProfile): 样式档案
+
+    Returns:
+        int: 相对开销
+    """
+    return ROW_BASE_COST + len(user_id) * (1 + profile.stroke_width)
+
+
+def schedule_chunks(tasks, profiles, workers, chunk_size=None):
+    """
+    将任务按样式档案分组、组内按文字长度从长到短排序，再切块并按估算开销从大到小排列。
+
+    Args:
+        tasks (list[tuple]): (编号, 用户ID, 样式档案索引, 输出文件名, 字号) 列表
+        profiles (tuple[StyleProfile, ...]): 样式档案
+        workers (int): 工作进程数
+        chunk_size (int): 每块任务数；缺省时按任务数与工作进程数自动确定
+
+    Returns:
+        list[list[tuple]]: 任务块列表（按分发顺序）
+    """
+    if chunk_size is None:
+        chunk_size = -(-len(tasks) // (workers * CHUNKS_PER_WORKER))
+        chunk_size = max(1, min(MAX_CHUNK_SIZE, chunk_size))
+
+    groups = {}
+    for task in tasks:
+        groups.setdefault(task[2], []).append(task)
+
+    chunks = []
+    for profile_index, group in groups.items():
+        profile = profiles[profile_index]
+        # 长度相近的文字求得的字号也相近，排在一起可复用同一字号的字体句柄
+        group.sort(key=lambda task: (-len(task[1]), task[4] or 0, task[0]))
+        for start in range(0, len(group), chunk_size):
+            chunk = group[start:start + chunk_size]
+            cost = sum(estimate_cost(task[1], profile) for task in chunk)
+            chunks.append((cost, chunk[0][0], chunk))
+
+    # 开销大的块先分发（最长处理时间优先），末尾只剩开销小的块，各工作进程几乎同时结束
+    chunks.sort(key=lambda item: (-item[0], item[1]))
+    return [chunk for _, _, chunk in chunks]
+
+
+def _init_worker(config_path, overrides):
+    """工作进程初始化：按相同的配置创建生成器（字体与背景在进程内按需加载并缓存）"""
+    global _worker_generator
+    from id_fill_generator import IDFillGenerator  # 函数级导入，避免循环依赖
+    _worker_generator = IDFillGenerator(config_path, overrides=overrides)
+
+
+def _render_chunk(chunk):
+    """
+    在工作进程中生成一块任务。
+
+    Returns:
+        list[tuple]: (编号, 用户ID, 输出文件名, 局部图块区域或 None) 列表
+    """
+    results = []
+    for i, user_id, profile_index, output_filename, font_size in chunk:
+        region = _worker_generator.create_id_image(user_id, output_filename, profile_index=profile_index,
+                                                   font_size=font_size)
+        results.append((i, user_id, output_filename, region))
+    return results
+
+
+def render_rows_parallel(generator, tasks, workers, chunk_size=None):
+    """
+    使用多进程生成图片。
+
+    Args:
+        generator (IDFillGenerator): 主进程中的生成器（提供配置路径、覆盖项与样式档案）
+        tasks (list[tuple]): (编号, 用户ID, 样式档案索引, 输出文件名, 字号) 列表
+        workers (int): 工作进程数
+        chunk_size (int): 每块任务数；缺省时自动确定
+
+    Returns:
+        list[tuple]: 按编号排序的 (编号, 用户ID, 输出文件名, 局部图块区域或 None) 列表
+    """
+    chunks = schedule_chunks(tasks, generator.profiles, workers, chunk_size)
+    logger.info(f"使用 {workers} 个工作进程生成，共 {len(chunks)} 个任务块（按样式分组，开销大的先分发）")
+
+    results = []
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(generator.config_path, generator.overrides)) as pool:
+        for chunk_results in pool.imap_unordered(_render_chunk, chunks):
+            results.extend(chunk_results)
+            logger.info(f"进度: {len(results)}/{len(tasks)} ({len(results)/len(tasks)*100:.1f}%)")
+    results.sort(key=lambda item: item[0])
+    return results
@@ -0,0 +1,101 @@
+"""
+排版引擎基准测试
+在当前 ID 列表（Excel）上分别测量 BASIC 与 RAQM 引擎的排版开销（测量 + 绘制），
+并与按书写系统自动选择引擎（layout_engine=auto）的结果对比。
+
+用法：
+    python benchmark_layout.py [--config config.json] [--repeat 20] [--with-samples] > bench_output.txt
+"""
+
+import argparse
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from id_fill_generator import IDFillGenerator
+from text_shaping import RAQM_AVAILABLE, detect_script, shaping_for_text
+
+
+# 复杂文字样例（--with-samples 时加入，用于在 ID 列表不含复杂文字时观察 RAQM 的开销）
+COMPLEX_SAMPLES = ['محمد علي', 'שלום', 'สวัสดีครับ', 'नमस्ते', 'தமிழ்', 'école']
+
+
+def classify(text):
+    """按书写系统把 ID 分为 ascii / simple（中日韩等无需整形的文字）/ complex（需要整形）"""
+    if text.isascii():
+        return 'ascii'
+    return 'simple' if detect_script(text) is None else 'complex'
+
+
+def time_layout(draw, items, repeat, engine_for):
+    """
+    测量一组 ID 的平均排版耗时。
+
+    Args:
+        draw (ImageDraw.ImageDraw): 绘制目标
+        items (list[tuple[str, StyleProfile, int]]): (ID, 样式档案, 字号)
+        repeat (int): 重复次数
+        engine_for (callable): ID -> TextShaping
+
+    Returns:
+        float: 每个 ID 的平均耗时（微秒）
+    """
+    prepared = []
+    for text, profile, size in items:
+        shaping = engine_for(text)
+        font = ImageFont.truetype(profile.font_path, size, layout_engine=shaping.engine)
+        prepared.append((text, profile, font, shaping))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text, profile, font, shaping in prepared:
+            draw.textbbox(profile.text_xy, text, font=font, stroke_width=profile.stroke_width,
+                          anchor=profile.anchor, direction=shaping.direction, language=shaping.language)
+            draw.text(profile.text_xy, text, font=font, fill=profile.color, stroke_width=profile.stroke_width,
+                      stroke_fill=profile.stroke_color, anchor=profile.anchor,
+                      direction=shaping.direction, language=shaping.language)
+    return (time.perf_counter() - start) / (repeat * len(prepared)) * 1e6
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="排版引擎基准测试")
+    parser.add_argument('--config', default='config.json', help="配置文件路径（默认 config.json）")
+    parser.add_argument('--repeat', type=int, default=20, help="重复次数（默认 20）")
+    parser.add_argument('--with-samples', action='store_true', help="加入阿拉伯文、泰文、天城文等复杂文字样例")
+    args = parser.parse_args()
+
+    generator = IDFillGenerator(args.config)
+    user_ids = [str(u) for u in generator.read_excel_data()]
+    if args.with_samples:
+        user_ids += COMPLEX_SAMPLES
+    rows = generator.build_render_rows(user_ids)
+    sizes = generator.solve_font_sizes(rows)
+
+    groups = {'ascii': [], 'simple': [], 'complex': []}
+    for i, user_id, profile_index in rows:
+        profile = generator.profiles[profile_index]
+        groups[classify(user_id)].append((user_id, profile, sizes.get(i, profile.max_font_size)))
+    everything = [item for items in groups.values() for item in items]
+
+    tb = generator.config['text_box']
+    canvas = Image.new('RGBA', (tb['x'] + tb['width'] * 2, tb['y'] + tb['height'] * 2))
+    draw = ImageDraw.Draw(canvas)
+
+    engines = [('BASIC', lambda text: shaping_for_text(text, 'basic'))]
+    if RAQM_AVAILABLE:
+        engines.append(('RAQM', lambda text: shaping_for_text(text, 'raqm')))
+    engines.append(('auto', lambda text: shaping_for_text(text, 'auto')))
+
+    print(f"RAQM 可用: {'是' if RAQM_AVAILABLE else '否（复杂文字回退 BASIC，auto 与 BASIC 相同）'}")
+    counts = ', '.join(f"{name}={len(items)}" for name, items in groups.items())
+    print(f"ID 数量: {counts}，重复 {args.repeat} 次")
+    print(f"{'分组':<10}" + ''.join(f"{name:>12}" for name, _ in engines) + "   （每个 ID 的平均耗时，微秒）")
+    for name, items in list(groups.items()) + [('全部', everything)]:
+        if not items:
+            continue
+        cells = ''.join(f"{time_layout(draw, items, args.repeat, engine_for):>12.1f}" for _, engine_for in engines)
+        print(f"{name:<10}{cells}")
+
+
+if __name__ == '__main__':
+    main()
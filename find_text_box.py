@@ -1,29 +1,117 @@
 """
 方框位置确定工具
 通过鼠标点击确定背景图片中文字方框的位置和大小
+也可自动检测候选方框：图形界面中点击候选即可选中；--auto 参数下无界面直接写入最佳候选
 """
 
+import sys
 import json
-from PIL import Image, ImageTk, ImageDraw
-import tkinter as tk
-from tkinter import messagebox, filedialog
+import argparse
+from PIL import Image, ImageDraw
 import logging
 
+from text_box_detector import detect_text_boxes
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 图形界面模块（tkinter、ImageTk）只在启动图形界面时导入，--auto 无界面检测在没有 Tk 的服务器上也能运行
+tk = messagebox = filedialog = ImageTk = None
+
+
+def import_gui_modules():
+    """导入图形界面所需的 tkinter 与 PIL.ImageTk（由 TextBoxFinder 在创建窗口前调用）"""
+    global tk, messagebox, filedialog, ImageTk
+    import tkinter as tk
+    from tkinter import messagebox, filedialog
+    from PIL import ImageTk
+
+
+# 默认配置（config.json 不存在时使用）
+DEFAULT_CONFIG = {
+    "background_image": "img/background.png",
+    "font_path": "font/BitTrip7(sRB).TTF",
+    "excel_file": "data/UserIds.xlsx",
+    "output_dir": "output",
+    "text_box": {
+        "x": 100,
+        "y": 100,
+        "width": 300,
+        "height": 80
+    },
+    "font_settings": {
+        "color": [0, 0, 0],
+        "max_font_size": 48,
+        "min_font_size": 12
+    },
+    "text_alignment": "center",
+    "padding": 10
+}
+
+# 候选方框在画布上的显示颜色（按得分顺序循环使用）
+CANDIDATE_COLORS = ['#00e5ff', '#ffb300', '#76ff03', '#ff4081', '#b388ff']
+
+
+def save_text_box(config_path, rect):
+    """
+    将文字方框写入配置文件（读取现有配置或创建默认配置）。
+
+    Args:
+        config_path (str): 配置文件路径
+        rect (dict): 方框 {"x", "y", "width", "height"}
+    """
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = json.loads(json.dumps(DEFAULT_CONFIG))
+
+    # 更新方框配置
+    config["text_box"] = {key: int(rect[key]) for key in ('x', 'y', 'width', 'height')}
+
+    # 保存配置
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=4, ensure_ascii=False)
+
+
+def background_image_for(config_path):
+    """
+    读取配置文件中的背景图片路径（配置文件不存在时使用默认配置）。
+
+    Args:
+        config_path (str): 配置文件路径
+
+    Returns:
+        str: 背景图片路径
+    """
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('background_image', DEFAULT_CONFIG['background_image'])
+    except FileNotFoundError:
+        return DEFAULT_CONFIG['background_image']
+
 
 class TextBoxFinder:
     """文字方框位置确定工具类"""
     
-    def __init__(self):
-        """初始化工具"""
+    def __init__(self, config_path="config.json"):
+        """
+        初始化工具
+
+        Args:
+            config_path (str): 配置文件路径（读取其中的背景图片，并将方框保存到该文件）
+        """
+        import_gui_modules()
         self.root = tk.Tk()
         self.root.title("方框位置确定工具")
         self.root.geometry("800x600")
         
-        self.image_path = "img/background.png"
-        self.config_path = "config.json"
+        self.config_path = config_path
+        try:
+            self.image_path = background_image_for(config_path)
+        except Exception as e:
+            logger.warning(f"读取配置文件失败，使用默认背景图片: {e}")
+            self.image_path = DEFAULT_CONFIG['background_image']
         
         self.canvas = None
         self.image = None
@@ -32,6 +120,7 @@ class TextBoxFinder:
         self.start_y = None
         self.rect_id = None
         self.current_rect = None
+        self.candidates = []
         
         self.setup_ui()
         self.load_image()
@@ -45,16 +134,18 @@ class TextBoxFinder:
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="文件", menu=file_menu)
         file_menu.add_command(label="选择背景图片", command=self.select_image)
+        file_menu.add_command(label="自动检测方框", command=self.detect_candidates)
         file_menu.add_command(label="保存配置", command=self.save_config)
         
         # 创建工具栏
         toolbar = tk.Frame(self.root)
         toolbar.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
         
-        tk.Label(toolbar, text="使用说明：按住鼠标左键拖拽选择文字方框区域").pack(side=tk.LEFT)
+        tk.Label(toolbar, text="使用说明：点击自动检测到的候选方框，或按住鼠标左键拖拽选择文字方框区域").pack(side=tk.LEFT)
         
         tk.Button(toolbar, text="重置", command=self.reset_selection).pack(side=tk.RIGHT, padx=5)
         tk.Button(toolbar, text="保存配置", command=self.save_config).pack(side=tk.RIGHT, padx=5)
+        tk.Button(toolbar, text="自动检测", command=self.detect_candidates).pack(side=tk.RIGHT, padx=5)
         
         # 创建画布
         canvas_frame = tk.Frame(self.root)
@@ -109,11 +200,63 @@ class TextBoxFinder:
             self.canvas.config(scrollregion=self.canvas.bbox("all"))
             
             self.status_bar.config(text=f"图片已加载: {self.image_path} (缩放比例: {self.scale:.2f})")
+            self.detect_candidates()
             
         except Exception as e:
             messagebox.showerror("错误", f"加载图片失败: {e}")
             logger.error(f"加载图片失败: {e}")
     
+    def detect_candidates(self):
+        """自动检测候选方框，并以不同颜色的虚线框显示在画布上（编号按得分排序）"""
+        if self.image is None:
+            return
+        try:
+            self.candidates = detect_text_boxes(self.image)
+        except Exception as e:
+            logger.error(f"自动检测方框失败: {e}")
+            self.candidates = []
+        self.canvas.delete("candidate")
+        for number, cand in enumerate(self.candidates, 1):
+            color = CANDIDATE_COLORS[(number - 1) % len(CANDIDATE_COLORS)]
+            x1 = cand['x'] * self.scale
+            y1 = cand['y'] * self.scale
+            x2 = (cand['x'] + cand['width']) * self.scale
+            y2 = (cand['y'] + cand['height']) * self.scale
+            self.canvas.create_rectangle(x1, y1, x2, y2, outline=color, width=2, dash=(6, 4), tags="candidate")
+            self.canvas.create_text(x1 + 4, y1 + 2, text=str(number), fill=color, anchor=tk.NW, tags="candidate")
+        if self.candidates:
+            self.status_bar.config(text=f"检测到 {len(self.candidates)} 个候选方框：点击候选即可选中，再点击“保存配置”")
+        else:
+            self.status_bar.config(text="未检测到候选方框，请按住鼠标左键拖拽选择")
+
+    def candidate_at(self, x, y):
+        """
+        返回画布坐标 (x, y) 处得分最高的候选方框。
+
+        Returns:
+            dict | None: 候选方框
+        """
+        ox = x / self.scale
+        oy = y / self.scale
+        for cand in self.candidates:
+            if cand['x'] <= ox <= cand['x'] + cand['width'] and cand['y'] <= oy <= cand['y'] + cand['height']:
+                return cand
+        return None
+
+    def select_rect(self, rect):
+        """选中原图坐标下的方框，并在画布上高亮显示"""
+        if self.rect_id:
+            self.canvas.delete(self.rect_id)
+        self.rect_id = self.canvas.create_rectangle(
+            rect['x'] * self.scale, rect['y'] * self.scale,
+            (rect['x'] + rect['width']) * self.scale, (rect['y'] + rect['height']) * self.scale,
+            outline='red', width=2, fill='', stipple='gray50'
+        )
+        self.current_rect = {key: rect[key] for key in ('x', 'y', 'width', 'height')}
+        self.status_bar.config(
+            text=f"选择区域: x={rect['x']}, y={rect['y']}, 宽度={rect['width']}, 高度={rect['height']}"
+        )
+
     def on_mouse_press(self, event):
         """鼠标按下事件"""
         self.start_x = event.x
@@ -139,6 +282,13 @@ class TextBoxFinder:
     def on_mouse_release(self, event):
         """鼠标释放事件"""
         if self.start_x is not None and self.start_y is not None:
+            # 单击（几乎没有拖拽）时选中所点击的候选方框
+            if abs(event.x - self.start_x) < 3 and abs(event.y - self.start_y) < 3:
+                cand = self.candidate_at(event.x, event.y)
+                if cand is not None:
+                    self.select_rect(cand)
+                return
+
             # 计算矩形坐标（确保左上角坐标小于右下角坐标）
             x1 = min(self.start_x, event.x)
             y1 = min(self.start_y, event.y)
@@ -180,37 +330,7 @@ class TextBoxFinder:
             return
         
         try:
-            # 读取现有配置或创建默认配置
-            try:
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            except FileNotFoundError:
-                config = {
-                    "background_image": "img/background.png",
-                    "font_path": "font/BitTrip7(sRB).TTF",
-                    "excel_file": "data/UserIds.xlsx",
-                    "output_dir": "output",
-                    "text_box": {
-                        "x": 100,
-                        "y": 100,
-                        "width": 300,
-                        "height": 80
-                    },
-                    "font_settings": {
-                        "color": [0, 0, 0],
-                        "max_font_size": 48,
-                        "min_font_size": 12
-                    },
-                    "text_alignment": "center",
-                    "padding": 10
-                }
-            
-            # 更新方框配置
-            config["text_box"] = self.current_rect
-            
-            # 保存配置
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+            save_text_box(self.config_path, self.current_rect)
             
             messagebox.showinfo("成功", f"配置已保存到 {self.config_path}")
             logger.info(f"配置已保存: {self.current_rect}")
@@ -224,9 +344,45 @@ class TextBoxFinder:
         self.root.mainloop()
 
 
+def auto_detect(config_path="config.json"):
+    """
+    无界面模式：检测背景图片中的最佳候选方框并写入配置文件。
+
+    Args:
+        config_path (str): 配置文件路径
+
+    Returns:
+        int: 退出码（0 成功；3 未检测到候选；1 出错）
+    """
+    try:
+        image_path = background_image_for(config_path)
+        candidates = detect_text_boxes(image_path)
+        if not candidates:
+            logger.warning(f"未在 {image_path} 中检测到候选方框")
+            return 3
+        best = candidates[0]
+        save_text_box(config_path, best)
+        logger.info(f"已自动检测并保存方框: {best}")
+        return 0
+    except Exception as e:
+        logger.error(f"自动检测方框失败: {e}")
+        return 1
+
+
 def main():
     """主函数"""
-    app = TextBoxFinder()
+    parser = argparse.ArgumentParser(description="方框位置确定工具")
+    parser.add_argument('--auto', action='store_true', help="无界面自动检测方框并写入 config.json")
+    parser.add_argument('--config', default='config.json', help="配置文件路径（默认 config.json）")
+    args = parser.parse_args()
+    if args.auto:
+        sys.exit(auto_detect(args.config))
+
+    try:
+        app = TextBoxFinder(args.config)
+    except ImportError as e:
+        logger.error(f"无法启动图形界面（未安装 tkinter）: {e}；可使用 --auto 无界面检测")
+        sys.exit(1)
     app.run()
 
 
@@ -0,0 +1,334 @@
+"""
+像素字体字形图集模块
+项目使用的字体都是像素字体：字形由原生网格（例如 7px）上的方块组成。FreeType 每张图片都要在最大 400px 的字号下
+重新光栅化轮廓并计算描边，开销很大，且非整数倍缩放时边缘会出现灰色过渡像素。
+启用图集后，每个字形只在原生网格字号下光栅化一次（二值化后缓存），绘制时按整数倍最近邻放大后拼接；
+描边用圆形结构元素膨胀得到（与 FreeType 圆角描边一致），结果是边缘锐利的纯色方块。
+"""
+
+import logging
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# 默认图集设置
+DEFAULT_GLYPH_ATLAS = {
+    'enabled': False,
+    'native_size': None,
+}
+
+# 自动检测原生网格字号时的探测文字与搜索范围
+PROBE_TEXT = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+MAX_NATIVE_SIZE = 32
+
+# 检测时允许的灰色像素比例（灰色指 32~223 之间的覆盖度）；原生字号下像素字体几乎没有灰色像素
+MAX_GREY_RATIO = 0.02
+
+# 覆盖度不低于该值的像素视为字形的一部分
+INK_THRESHOLD = 128
+
+# 前进宽度与字偶距在原生字号的该倍数下测量（空格等字形的宽度可能不是网格的整数倍）
+METRIC_SCALE = 64
+
+
+def parse_glyph_atlas(config):
+    """
+    解析并校验配置中的 glyph_atlas 字段（缺省项使用 DEFAULT_GLYPH_ATLAS）。
+
+    Args:
+        config (dict): 配置信息
+
+    Returns:
+        dict: 合并后的图集设置
+    """
+    settings = config.get('glyph_atlas') or {}
+    if not isinstance(settings, dict):
+        raise ValueError("配置无效: glyph_atlas 必须为字典")
+    merged = dict(DEFAULT_GLYPH_ATLAS)
+    merged.update(settings)
+    if not isinstance(merged['enabled'], bool):
+        raise ValueError("配置无效: glyph_atlas.enabled 必须为 true/false")
+    native_size = merged['native_size']
+    if native_size is not None and (not isinstance(native_size, int) or isinstance(native_size, bool)
+                                    or native_size < 1):
+        raise ValueError("配置无效: glyph_atlas.native_size 必须为正整数或 null（自动检测）")
+    return merged
+
+
+def _mask_array(mask):
+    """将 Pillow 的字形遮罩转换为 numpy 数组（行, 列）"""
+    return np.asarray(mask, dtype=np.uint8).reshape(mask.size[1], mask.size[0])
+
+
+def _is_crisp(coverage):
+    """字形覆盖度中灰色过渡像素的比例是否足够小"""
+    ink = coverage[coverage > 0]
+    return not ink.size or ((ink >= 32) & (ink < 224)).mean() <= MAX_GREY_RATIO
+
+
+def detect_native_size(font_path):
+    """
+    检测像素字体的原生网格字号：在该字号下光栅化的字形几乎没有灰色过渡像素。
+
+    Args:
+        font_path (str): 字体文件路径
+
+    Returns:
+        int | None: 原生字号；不是像素字体时返回 None
+    """
+    for size in range(4, MAX_NATIVE_SIZE + 1):
+        mask, _ = ImageFont.truetype(font_path, size).getmask2(PROBE_TEXT, mode='L')
+        coverage = _mask_array(mask)
+        if coverage.any() and _is_crisp(coverage):
+            return size
+    return None
+
+
+def disk_dilate(mask, radius):
+    """
+    用半径为 radius 的圆形结构元素膨胀二值遮罩（与 FreeType 圆角描边的覆盖范围一致）。
+
+    先按每行所需的半宽做水平膨胀，再按行偏移合并，运算次数与半径成正比。
+
+    Args:
+        mask (np.ndarray): 布尔遮罩，四周至少留出 radius 像素的空白
+        radius (int): 描边宽度
+
+    Returns:
+        np.ndarray: 膨胀后的布尔遮罩
+    """
+    limit = (radius + 0.5) ** 2
+    half_widths = [int((limit - dy * dy) ** 0.5) for dy in range(radius + 1)]
+    horizontal = [mask]
+    for h in range(1, half_widths[0] + 1):
+        grown = horizontal[-1].copy()
+        grown[:, h:] |= mask[:, :-h]
+        grown[:, :-h] |= mask[:, h:]
+        horizontal.append(grown)
+    out = horizontal[half_widths[0]].copy()
+    for dy in range(1, radius + 1):
+        row = horizontal[half_widths[dy]]
+        out[dy:] |= row[:-dy]
+        out[:-dy] |= row[dy:]
+    return out
+
+
+class GlyphAtlas:
+    """
+    单个像素字体的字形图集：原生字号下的二值字形、前进宽度与字偶距，以及按放大倍数缓存的放大字形。
+
+    只用于字号为原生字号整数倍、使用 BASIC 排版引擎、且全部字形都落在网格上的文字
+（字体缺字时的替代方框等字形不在网格上）；其余情况由调用方回退 FreeType 绘制。
+    """
+
+    def __init__(self, font_path, native_size):
+        """
+        Args:
+            font_path (str): 字体文件路径
+            native_size (int): 原生网格字号
+        """
+        self.font_path = font_path
+        self.native_size = native_size
+        self.font = ImageFont.truetype(font_path, native_size)
+        self.metrics_font = ImageFont.truetype(font_path, native_size * METRIC_SCALE)
+        self._cells = {}
+        self._scaled = {}
+        self._advances = {}
+        self._kerns = {}
+
+    def snap(self, size):
+        """将字号向下取整为原生字号的整数倍（小于原生字号时保持不变，由 FreeType 绘制）"""
+        return size - size % self.native_size if size >= self.native_size else size
+
+    def supports(self, text, font_size, shaping):
+        """文字、字号与排版方式是否可以用图集绘制"""
+        return (shaping.direction is None and font_size >= self.native_size
+                and font_size % self.native_size == 0
+                and all(self._cell(ch)[3] for ch in set(text) - {'\n'}))
+
+    def _cell(self, ch):
+        """
+        原生字号下的二值字形：(遮罩, 相对笔位与基线的列偏移, 行偏移, 是否落在网格上)；空白字形的遮罩为 None
+        """
+        cell = self._cells.get(ch)
+        if cell is None:
+            mask, (ox, oy) = self.font.getmask2(ch, mode='L', anchor='ls')
+            coverage = _mask_array(mask) if mask.size[0] and mask.size[1] else np.zeros((0, 0), np.uint8)
+            ink = coverage >= INK_THRESHOLD
+            rows = np.flatnonzero(ink.any(axis=1))
+            cols = np.flatnonzero(ink.any(axis=0))
+            if rows.size:
+                ink = ink[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+                cell = (ink, ox + int(cols[0]), oy + int(rows[0]), _is_crisp(coverage))
+            else:
+                cell = (None, 0, 0, not coverage.any())
+            self._cells[ch] = cell
+        return cell
+
+    def _scaled_cell(self, ch, scale):
+        """按整数倍最近邻放大的字形（布尔遮罩）"""
+        key = (ch, scale)
+        scaled = self._scaled.get(key)
+        if scaled is None:
+            ink = self._cell(ch)[0]
+            scaled = None if ink is None else np.repeat(np.repeat(ink, scale, axis=0), scale, axis=1)
+            self._scaled[key] = scaled
+        return scaled
+
+    def _pen_positions(self, line):
+        """各字的笔位（含字偶距）与整行前进宽度，以原生字号的像素为单位（可为小数）"""
+        positions = []
+        x = 0.0
+        prev = None
+        for ch in line:
+            if prev is not None:
+                pair = prev + ch
+                kern = self._kerns.get(pair)
+                if kern is None:
+                    kern = self.metrics_font.getlength(pair) / METRIC_SCALE - self._advance(prev) - self._advance(ch)
+                    self._kerns[pair] = kern
+                x += kern
+            positions.append(x)
+            x += self._advance(ch)
+            prev = ch
+        return positions, x
+
+    def _advance(self, ch):
+        """单字的前进宽度（原生字号的像素，可为小数）"""
+        advance = self._advances.get(ch)
+        if advance is None:
+            advance = self.metrics_font.getlength(ch) / METRIC_SCALE
+            self._advances[ch] = advance
+        return advance
+
+    def layout(self, xy, text, font, anchor='la', spacing=0, align='left', stroke_width=0):
+        """
+        计算各字形在目标图片中的位置（行定位方式与 Pillow 的 multiline_text 一致）。
+
+        水平方向使用原生网格宽度的整数倍（字形紧密拼接，不出现半像素缝隙）；
+        基线与行距取自目标字号的 FreeType 度量，与直接绘制时的垂直位置一致。
+
+        Args:
+            xy (tuple[int, int]): 锚点坐标
+            text (str): 文字（可含换行符）
+            font (ImageFont.FreeTypeFont): 目标字号的字体（字号须为原生字号的整数倍）
+            anchor (str): Pillow anchor
+            spacing (int): 行间距（像素）
+            align (str): 多行文字的对齐方式
+            stroke_width (int): 描边宽度
+
+        Returns:
+            list[tuple[int, int, np.ndarray]]: (x, y, 放大后的字形) 列表
+        """
+        scale = font.size // self.native_size
+        lines = text.split('\n')
+        laid = [self._pen_positions(line) for line in lines]
+        widths = [advance * scale for _, advance in laid]
+        max_width = max(widths)
+        line_spacing = font.getbbox('A', stroke_width=stroke_width)[3] + stroke_width + spacing
+
+        top = xy[1]
+        if len(lines) > 1:
+            if anchor[1] == 'm':
+                top -= (len(lines) - 1) * line_spacing / 2.0
+            elif anchor[1] == 'd':
+                top -= (len(lines) - 1) * line_spacing
+
+        placements = []
+        for line, (positions, _), width in zip(lines, laid, widths):
+            left = xy[0]
+            if len(lines) > 1:
+                difference = max_width - width
+                if align == 'center':
+                    left += difference / 2.0
+                elif align == 'right':
+                    left += difference
+                if anchor[0] == 'm':
+                    left -= difference / 2.0
+                elif anchor[0] == 'r':
+                    left -= difference
+            if line:
+                # 行锚点 -> 笔位与基线：水平按网格宽度，垂直按目标字号的 FreeType 度量
+                if anchor[0] == 'm':
+                    left -= width / 2.0
+                elif anchor[0] == 'r':
+                    left -= width
+                pen_x = int(left)
+                baseline = int(top) + font.getbbox(line, anchor=anchor)[1] - font.getbbox(line, anchor='ls')[1]
+                for ch, pos in zip(line, positions):
+                    scaled = self._scaled_cell(ch, scale)
+                    if scaled is not None:
+                        _, ox, oy, _ = self._cell(ch)
+                        placements.append((pen_x + int(round(pos * scale)) + ox * scale, baseline + oy * scale, scaled))
+            top += line_spacing
+        return placements
+
+    def render_masks(self, xy, text, font, anchor='la', spacing=0, align='left', stroke_width=0):
+        """
+        绘制文字与描边的覆盖遮罩。
+
+        Args:
+            同 layout
+
+        Returns:
+            tuple[tuple[int, int, int, int], Image.Image, Image.Image | None] | None:
+                (遮罩在目标图片中的区域, 文字遮罩, 描边遮罩（含文字部分，无描边时为 None))，遮罩均为 '1' 模式；
+                没有可见字形时返回 None
+        """
+        placements = self.layout(xy, text, font, anchor, spacing, align, stroke_width)
+        if not placements:
+            return None
+        x0 = min(x for x, _, _ in placements) - stroke_width
+        y0 = min(y for _, y, _ in placements) - stroke_width
+        x1 = max(x + cell.shape[1] for x, _, cell in placements) + stroke_width
+        y1 = max(y + cell.shape[0] for _, y, cell in placements) + stroke_width
+
+        ink = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+        for x, y, cell in placements:
+            ink[y - y0:y - y0 + cell.shape[0], x - x0:x - x0 + cell.shape[1]] |= cell
+        # 二值遮罩（'1' 模式）：绘制时直接覆盖像素，无需按覆盖度逐像素混合，比 'L' 模式遮罩快一个数量级
+        fill_mask = Image.fromarray(ink)
+        stroke_mask = Image.fromarray(disk_dilate(ink, stroke_width)) if stroke_width else None
+        return (x0, y0, x1, y1), fill_mask, stroke_mask
+
+    def textbbox(self, xy, text, font, anchor='la', spacing=0, align='left', stroke_width=0):
+        """
+        文字（含描边）实际覆盖的区域。
+
+        Returns:
+            tuple[int, int, int, int]: (x0, y0, x1, y1)；没有可见字形时为锚点处的空区域
+        """
+        placements = self.layout(xy, text, font, anchor, spacing, align, stroke_width)
+        if not placements:
+            return (int(xy[0]), int(xy[1]), int(xy[0]), int(xy[1]))
+        return (
+            min(x for x, _, _ in placements) - stroke_width,
+            min(y for _, y, _ in placements) - stroke_width,
+            max(x + cell.shape[1] for x, _, cell in placements) + stroke_width,
+            max(y + cell.shape[0] for _, y, cell in placements) + stroke_width,
+        )
+
+    def draw(self, image, xy, text, font, fill, anchor='la', spacing=0, align='left',
+             stroke_width=0, stroke_fill=None):
+        """
+        在图片上绘制文字：先用描边颜色绘制描边遮罩，再用文字颜色绘制文字遮罩（与 Pillow 的绘制顺序一致）。
+
+        Args:
+            image (Image.Image): 目标图片
+            fill (tuple): 文字颜色
+            stroke_fill (tuple): 描边颜色，缺省时与文字颜色相同
+            其余参数同 layout
+        """
+        masks = self.render_masks(xy, text, font, anchor, spacing, align, stroke_width)
+        if masks is None:
+            return
+        (x0, y0, _, _), fill_mask, stroke_mask = masks
+        draw = ImageDraw.Draw(image)
+        if stroke_mask is not None:
+            draw.bitmap((x0, y0), stroke_mask, fill=fill if stroke_fill is None else stroke_fill)
+            if stroke_fill is not None and tuple(stroke_fill) != tuple(fill):
+                draw.bitmap((x0, y0), fill_mask, fill=fill)
+        else:
+            draw.bitmap((x0, y0), fill_mask, fill=fill)
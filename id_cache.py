@@ -0,0 +1,117 @@
+"""
+ID 数据快照缓存
+首次读取 Excel 后，将清洗后的 ID 列写入紧凑的长度前缀二进制快照；
+之后只要工作簿的路径、大小与修改时间都未变化，就直接读取快照，跳过 pd.read_excel 的完整解析。
+
+快照格式（小端序）：
+    8 字节魔数（含格式版本） | uint32 键长度 | 键（UTF-8） | uint32 ID 数量 | 逐个 [uint32 长度 | UTF-8 字节]
+键为 "绝对路径|文件大小|修改时间(ns)"；任何不匹配或损坏都视为未命中。
+"""
+
+import os
+import struct
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 魔数中包含版本号：修改 ID 清洗规则或格式时递增，旧快照自动失效
+SNAPSHOT_MAGIC = b'BLPIDS1\n'
+
+_U32 = struct.Struct('<I')
+
+
+def workbook_key(path):
+    """
+    生成工作簿的快照键（绝对路径、大小、修改时间）。
+
+    Args:
+        path (str): 工作簿路径
+
+    Returns:
+        str: 快照键
+    """
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def snapshot_path(cache_dir, workbook_path):
+    """
+    快照文件路径：缓存目录下以工作簿绝对路径的哈希命名，不同工作簿互不干扰。
+
+    Args:
+        cache_dir (str): 缓存目录
+        workbook_path (str): 工作簿路径
+
+    Returns:
+        str: 快照文件路径
+    """
+    digest = hashlib.sha1(os.path.abspath(workbook_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{digest}.ids")
+
+
+def read_snapshot(path, key):
+    """
+    读取快照；文件不存在、键不匹配或内容损坏时返回 None。
+
+    Args:
+        path (str): 快照文件路径
+        key (str): 期望的快照键
+
+    Returns:
+        list[str] | None: ID 列表
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        if not data.startswith(SNAPSHOT_MAGIC):
+            return None
+        pos = len(SNAPSHOT_MAGIC)
+        (length,) = _U32.unpack_from(data, pos)
+        pos += 4
+        if data[pos:pos + length].decode('utf-8') != key:
+            return None
+        pos += length
+        (count,) = _U32.unpack_from(data, pos)
+        pos += 4
+        ids = []
+        for _ in range(count):
+            (length,) = _U32.unpack_from(data, pos)
+            pos += 4
+            ids.append(data[pos:pos + length].decode('utf-8'))
+            pos += length
+        if pos != len(data):
+            return None
+        return ids
+    except (struct.error, UnicodeDecodeError) as e:
+        logger.warning(f"ID 快照已损坏，将重新解析 Excel: {e}")
+        return None
+
+
+def write_snapshot(path, key, ids):
+    """
+    写入快照（先写临时文件再替换，避免中断时留下不完整的快照）。
+
+    Args:
+        path (str): 快照文件路径
+        key (str): 快照键
+        ids (list[str]): 清洗后的 ID 列表
+    """
+    parts = [SNAPSHOT_MAGIC]
+    encoded_key = key.encode('utf-8')
+    parts.append(_U32.pack(len(encoded_key)))
+    parts.append(encoded_key)
+    parts.append(_U32.pack(len(ids)))
+    for user_id in ids:
+        encoded = user_id.encode('utf-8')
+        parts.append(_U32.pack(len(encoded)))
+        parts.append(encoded)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(parts))
+    os.replace(tmp_path, path)
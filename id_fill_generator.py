@@ -4,36 +4,170 @@ ID填充图片生成器
 支持自适应字体大小，确保文字完整显示且不超出方框
 """
 
+import io
+import math
 import os
 import json
+import argparse
+import multiprocessing
 import pandas as pd
 from PIL import Image, ImageDraw, ImageFont
 import logging
 import sys
 
+from batch_scheduler import render_rows_parallel, resolve_worker_count
+from glyph_atlas import GlyphAtlas, detect_native_size, parse_glyph_atlas
+from id_cache import read_snapshot, snapshot_path, workbook_key, write_snapshot
+from imposition import ImpositionLayout, SheetImposer, open_sheet_writer, parse_imposition
+from layout_solver import _MEASURE_DRAW, BatchFontSizer, measure_safe_size
+from output_layout import PATCH_MANIFEST_NAME, OutputIndexWriter, OutputLayout, write_patch_manifest
+from output_variants import VariantRenderer, parse_color_variants, parse_output_variants
+from preview import parse_preview, render_preview
+from text_fitting import TextFitter, parse_text_fit
+from text_shaping import shaping_for_text
+from style_profiles import _resolve_font_path, compile_style_profiles, is_ascii_text, merge_font_settings, profile_index_for_text
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def _rgba(color):
+    """将 (R, G, B) 或 (R, G, B, A) 颜色规范化为 RGBA（省略的透明度视为 255）"""
+    return tuple(color) + (255,) * (4 - len(color))
+
+
+def merge_config(base, overrides):
+    """
+    合并配置：overrides 中的字段覆盖 base；两者同为字典的字段递归合并（例如只覆盖 font_settings.color）。
+
+    Args:
+        base (dict): 基础配置
+        overrides (dict): 覆盖项
+
+    Returns:
+        dict: 合并后的新配置（不修改输入）
+    """
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
 class IDFillGenerator:
     """ID填充图片生成器类"""
     
-    def __init__(self, config_path='config.json'):
+    def __init__(self, config_path='config.json', overrides=None, resources=None):
         """
         初始化生成器
         
         Args:
             config_path (str): 配置文件路径
+            overrides (dict): 可选，覆盖配置文件中的字段（嵌套字典按键合并），用于多任务批量运行
+            resources (ResourceCache): 可选，多个生成器共享的字体与背景缓存
         """
-        self.config = self.load_config(config_path)
-        self.font_path = self.config['font_path']
-        self.background_path = self.config['background_image']
-        self.excel_path = self.config['excel_file']
-        self.output_dir = self.config['output_dir']
+        self.config_path = config_path
+        self.overrides = overrides
+        self.resources = resources
+        self.profiles = ()
+        self._background = None
+        self._made_dirs = set()
+        self.apply_config(self.load_config(config_path))
+
+    def apply_config(self, config):
+        """
+        应用（或重新应用）配置：校验并编译样式档案，更新路径相关属性。
+
+        说明：
+        - 重新应用时，签名未变化的样式档案会被保留，以复用其已加载的字体句柄。
+        - 背景图片路径变化时清空背景缓存。
+
+        Args:
+            config (dict): 配置信息
+        """
+        if self.overrides:
+            config = merge_config(config, self.overrides)
+
+        # 启动时一次性校验配置并编译样式档案（逐行绘制只引用档案索引）
+        font_cache = self.resources.fonts if self.resources is not None else None
+        profiles = compile_style_profiles(config, font_cache=font_cache)
+        OutputLayout(config.get('output_layout'))  # 提前校验输出布局配置
+        self.variants = parse_output_variants(config)
+        self.variant_renderer = VariantRenderer(self.variants)
+        # 颜色变体：同一 ID 以不同的文字/描边颜色输出到 <变体名>/ 子目录，文字遮罩只光栅化一次
+        self.color_variants = parse_color_variants(config, self.variants)
+
+        # 输出模式：full（完整图片，默认）/ patch（只输出文字区域图块及位置清单）/ imposition（拼版到纸张页面）
+        output_mode = config.get('output_mode', 'full')
+        patch_crop = config.get('patch_crop', 'box')
+        if output_mode not in ('full', 'patch', 'imposition'):
+            raise ValueError(f"配置无效: output_mode 必须为 full/patch/imposition，当前为 {output_mode}")
+        if patch_crop not in ('box', 'tight'):
+            raise ValueError(f"配置无效: patch_crop 必须为 box/tight，当前为 {patch_crop}")
+        if output_mode != 'full' and self.variants:
+            logger.warning(f"output_mode={output_mode} 时忽略 output_variants")
+        if output_mode == 'imposition' and self.color_variants:
+            logger.warning("output_mode=imposition 时忽略 color_variants")
+        self.output_mode = output_mode
+        self.patch_crop = patch_crop
+        self.imposition = parse_imposition(config) if output_mode == 'imposition' else None
+
+        # 字号求解方式：predict（按字宽表预测后确认，默认）/ scan（从最大字号逐级缩小）
+        font_size_solver = config.get('font_size_solver', 'predict')
+        if font_size_solver not in ('predict', 'scan'):
+            raise ValueError(f"配置无效: font_size_solver 必须为 predict/scan，当前为 {font_size_solver}")
+        self.font_size_solver = font_size_solver
+        # 工作进程数：1（默认）在当前进程中顺序生成；大于 1 或 auto 时按样式分组后多进程生成
+        self.workers = resolve_worker_count(config.get('workers', 1))
+        self._sizers = {}
+        # 最小字号仍放不下时的处理：none（默认，文字超出方框）/ wrap / ellipsis / wrap_ellipsis
+        self.text_fit = parse_text_fit(config)
+        self._fitters = {}
+        # 像素字体字形图集：字号取原生网格的整数倍，字形按最近邻放大拼接，描边由膨胀得到
+        self.glyph_atlas = parse_glyph_atlas(config)
+        self._atlases = {}
+        # 预览联系表的抽样数量、缩小比例与列数（--preview）
+        self.preview = parse_preview(config)
+        old_profiles = {p.signature(): p for p in self.profiles}
+        self.profiles = tuple(old_profiles.get(p.signature(), p) for p in profiles)
+
+        self.config = config
+        self.font_path = config['font_path']
+        if config['background_image'] != getattr(self, 'background_path', None):
+            self._background = None
+        self.background_path = config['background_image']
+        self.excel_path = config['excel_file']
+        self.output_dir = config['output_dir']
         
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
+
+    def load_background(self):
+        """
+        加载背景图片（RGBA），并在实例内缓存；每次绘制时使用其副本。
+
+        Returns:
+            Image.Image: 背景图片
+        """
+        if self._background is None:
+            if self.resources is not None:
+                self._background = self.resources.background(self.background_path)
+            else:
+                self._background = Image.open(self.background_path).convert('RGBA')
+        return self._background
+
+    def reset_caches(self):
+        """清空背景图片、预缩放背景与字体句柄缓存（在磁盘上的模板或字体文件被修改后调用）。"""
+        self._background = None
+        self.variant_renderer.reset()
+        self._sizers = {}
+        self._fitters = {}
+        self._atlases = {}
+        for profile in self.profiles:
+            profile.clear_fonts()
         
     def load_config(self, config_path):
         """
@@ -62,22 +196,44 @@ class IDFillGenerator:
         - pandas.read_excel 默认将第一行作为列标题（header=0），因此 DataFrame 的第 0 行对应 Excel 的第二行（第一条数据）。
         - 这里不再跳过第 0 行，确保不会把第一条有效数据误删。
         - 对空值、纯空白做清理；统一为字符串并去除首尾空格。
+        - 清洗结果会写入 id_cache_dir 下的快照；工作簿路径、大小与修改时间未变化时直接读取快照，跳过 Excel 解析。
         
         Returns:
             list: 用户ID列表（字符串）
         """
         try:
+            cache_dir = self.config.get('id_cache_dir', '.cache')
+            cache_path = cache_key = None
+            if cache_dir:
+                try:
+                    cache_key = workbook_key(self.excel_path)
+                    cache_path = snapshot_path(cache_dir, self.excel_path)
+                    ids = read_snapshot(cache_path, cache_key)
+                    if ids is not None:
+                        logger.info(f"成功读取 {len(ids)} 个用户ID（使用快照缓存）")
+                        return ids
+                except OSError as e:
+                    logger.warning(f"ID 快照不可用，将解析 Excel: {e}")
+                    cache_path = None
+
             df = pd.read_excel(self.excel_path)  # 默认 header=0（首行作为列名）
             # 取第一列的所有数据（不跳过第 0 行）并清洗
             series = df.iloc[:, 0].dropna().astype(str).map(lambda s: s.strip())
             ids = [s for s in series if s and s.lower() != 'nan']
             logger.info(f"成功读取 {len(ids)} 个用户ID")
+
+            if cache_path:
+                try:
+                    write_snapshot(cache_path, cache_key, ids)
+                except OSError as e:
+                    logger.warning(f"ID 快照写入失败（不影响本次运行）: {e}")
             return ids
         except Exception as e:
             logger.error(f"读取Excel文件失败: {e}")
             raise
     
-    def calculate_font_size(self, text, font_path, max_width, max_height, max_font_size, min_font_size, stroke_width=0):
+    def calculate_font_size(self, text, font_path, max_width, max_height, max_font_size, min_font_size, stroke_width=0,
+                            font_getter=None, direction=None, language=None):
         """
         计算合适的字体大小，确保文字完整显示且不超出方框
         
@@ -89,35 +245,26 @@ class IDFillGenerator:
             max_font_size (int): 最大字体大小
             min_font_size (int): 最小字体大小
             stroke_width (int): 文字描边宽度，用于模拟加粗效果（同时会影响文字的实际宽高）
+            font_getter (callable): 可选，按字号返回字体对象（例如 StyleProfile.get_font），用于复用已加载的字体
+            direction (str): 可选，书写方向（仅 RAQM 引擎）
+            language (str): 可选，语言标签（仅 RAQM 引擎）
         
         Returns:
             int: 合适的字体大小
         """
         font_size = max_font_size
+        # 未提供 font_getter 时按文字的书写系统选择排版引擎（简单文字使用 BASIC）
+        engine = shaping_for_text(text, self.config.get('layout_engine', 'auto')).engine
         
         while font_size >= min_font_size:
             try:
-                font = ImageFont.truetype(font_path, font_size)
+                if font_getter is not None:
+                    font = font_getter(font_size)
+                else:
+                    font = ImageFont.truetype(font_path, font_size, layout_engine=engine)
                 
-                # 使用更准确的方法计算文字尺寸
-                # 创建临时图像来测量文字实际占用空间
-                temp_img = Image.new('RGB', (max_width * 2, max_height * 2), 'white')
-                temp_draw = ImageDraw.Draw(temp_img)
-                
-                # 获取文字边界框
-                # 在测量时考虑描边宽度，确保加粗后仍可正确计算
-                bbox = temp_draw.textbbox((0, 0), text, font=font, stroke_width=stroke_width)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                
-                # 获取字体度量信息，用于更准确的高度计算
-                ascent, descent = font.getmetrics()
-                actual_height = ascent + descent
-                
-                # 添加一些安全边距（3%）
-                safe_width = text_width * 1.03
-                # 当存在描边时，text_height 已包含描边，直接使用更可靠
-                safe_height = max(text_height, actual_height) * 1.03
+                # 测量文字尺寸（考虑描边宽度，并添加 3% 安全边距；与批量字号求解共用同一判定）
+                safe_width, safe_height = measure_safe_size(text, font, stroke_width, direction, language)
                 
                 # 检查是否适合方框
                 if safe_width <= max_width and safe_height <= max_height:
@@ -134,11 +281,7 @@ class IDFillGenerator:
 
     def is_ascii_text(self, text):
         """
-        判断文本是否全部为 ASCII 字符。
-
-        说明：
-        - 优先使用 Python 3.7+ 的 str.isascii() 方法。
-        - 若不可用或异常，则回退到逐字符检查码点 < 128。
+        判断文本是否全部为 ASCII 字符（英文/非英文的判断规则统一由 style_profiles.is_ascii_text 提供）。
 
         Args:
             text (str): 需要判断的文本
@@ -146,10 +289,7 @@ class IDFillGenerator:
         Returns:
             bool: True 表示全部为 ASCII；False 表示包含非 ASCII 字符
         """
-        try:
-            return str(text).isascii()
-        except Exception:
-            return all(ord(ch) < 128 for ch in str(text))
+        return is_ascii_text(text)
 
     def get_font_settings_for_text(self, text):
         """
@@ -170,200 +310,828 @@ class IDFillGenerator:
         Returns:
             dict: 合并后的字体设置字典（包含 color/max_font_size/min_font_size/bold/stroke_width/stroke_color）
         """
-        base = dict(self.config.get('font_settings', {}))
-        is_ascii = self.is_ascii_text(text)
-        overrides = self.config.get('font_settings_latin') if is_ascii else self.config.get('font_settings_non_latin')
-        if overrides:
-            base.update(overrides)
-
-        # 处理加粗/描边：
-        # - bold=False 时强制不描边
-        # - bold=True 且 stroke_width 缺省或为 0 时，默认 stroke_width=1
-        if not base.get('bold', False):
-            base['stroke_width'] = 0
+        return merge_font_settings(self.config, self.is_ascii_text(text))
+
+    def choose_font_path(self, text):
+        """
+        根据文本内容选择字体路径：英文使用 font_path_latin，非英文使用 font_path_non_latin，未配置时回退 font_path
+        （与样式档案使用同一规则）。
+
+        Args:
+            text (str): 需要绘制的文本
+
+        Returns:
+            str: 选择后的字体文件路径
+        """
+        return _resolve_font_path(self.config, self.is_ascii_text(text))
+
+    def _profile_for(self, text, profile_index=None):
+        """按索引获取样式档案；索引缺省时按文本类型（英文/非英文）自动选择"""
+        if profile_index is None:
+            profile_index = profile_index_for_text(text)
+        return self.profiles[profile_index]
+
+    def font_sizer(self, profile):
+        """
+        获取样式档案对应的批量字号求解器（字宽表按档案缓存）；字体无法加载或配置为 scan 时返回 None。
+
+        Args:
+            profile (StyleProfile): 样式档案
+
+        Returns:
+            BatchFontSizer | None: 求解器
+        """
+        if self.font_size_solver != 'predict':
+            return None
+        key = profile.signature()
+        if key not in self._sizers:
+            try:
+                self._sizers[key] = BatchFontSizer(profile)
+            except Exception as e:
+                logger.warning(f"字宽表构建失败，回退逐级搜索字号 ({profile.font_path}): {e}")
+                self._sizers[key] = None
+        return self._sizers[key]
+
+    def solve_font_sizes(self, rows):
+        """
+        为整批渲染行一次性求解字号：按样式档案分组，用字宽表向量化预测后逐个确认。
+
+        Args:
+            rows (list[tuple[int, str, int]]): 渲染行 (编号, 用户ID, 样式档案索引)
+
+        Returns:
+            dict[int, int]: 行编号 -> 字号；无法预测的行不包含在内（绘制时再单独计算）
+        """
+        sizes = {}
+        groups = {}
+        for i, user_id, profile_index in rows:
+            groups.setdefault(profile_index, []).append((i, user_id))
+        for profile_index, items in groups.items():
+            sizer = self.font_sizer(self.profiles[profile_index])
+            if sizer is None:
+                continue
+            try:
+                solved = sizer.solve([user_id for _, user_id in items])
+            except Exception as e:
+                logger.warning(f"批量字号求解失败，回退逐个计算: {e}")
+                continue
+            sizes.update((i, size) for (i, _), size in zip(items, solved))
+        return sizes
+
+    def _fit_font(self, text, profile, font_size=None):
+        """
+        计算合适的字体大小并返回对应字体（字体句柄由样式档案按字号缓存复用）。
+
+        Args:
+            text (str): 要显示的文字
+            profile (StyleProfile): 样式档案
+            font_size (int): 可选，已求解的字号（例如批量预先求解），提供时直接使用
+
+        Returns:
+            ImageFont.FreeTypeFont: 字体对象
+        """
+        shaping = profile.shaping_for(text)
+        if font_size is not None:
+            return profile.get_font(font_size, shaping.engine)
+        sizer = self.font_sizer(profile)
+        if sizer is not None:
+            try:
+                return profile.get_font(sizer.solve([text])[0], shaping.engine)
+            except Exception as e:
+                logger.warning(f"字号预测失败，回退逐级搜索: {e}")
+        font_size = self.calculate_font_size(
+            text,
+            profile.font_path,
+            profile.available_width,
+            profile.available_height,
+            profile.max_font_size,
+            profile.min_font_size,
+            stroke_width=profile.stroke_width,
+            font_getter=lambda size: profile.get_font(size, shaping.engine),
+            direction=shaping.direction,
+            language=shaping.language
+        )
+        return profile.get_font(font_size, shaping.engine)
+
+    def text_fitter(self, profile):
+        """
+        获取档案对应的多行/省略号适配器（按档案签名缓存）。
+
+        Args:
+            profile (StyleProfile): 样式档案
+
+        Returns:
+            TextFitter: 适配器
+        """
+        key = profile.signature()
+        fitter = self._fitters.get(key)
+        if fitter is None:
+            fitter = TextFitter(profile, self.text_fit)
+            self._fitters[key] = fitter
+        return fitter
+
+    def atlas_for(self, profile):
+        """
+        获取档案字体的字形图集（按字体路径缓存）；未启用图集或字体不是像素字体时返回 None。
+
+        Args:
+            profile (StyleProfile): 样式档案
+
+        Returns:
+            GlyphAtlas | None: 字形图集
+        """
+        if not self.glyph_atlas['enabled']:
+            return None
+        if profile.font_path not in self._atlases:
+            native_size = self.glyph_atlas['native_size'] or detect_native_size(profile.font_path)
+            if native_size is None:
+                logger.warning(f"未检测到像素字体的原生网格字号，使用 FreeType 绘制: {profile.font_path}")
+                self._atlases[profile.font_path] = None
+            else:
+                logger.info(f"字形图集: {profile.font_path}（原生字号 {native_size}px）")
+                self._atlases[profile.font_path] = GlyphAtlas(profile.font_path, native_size)
+        return self._atlases[profile.font_path]
+
+    def _layout_text(self, text, profile, font_size=None):
+        """
+        确定实际绘制的文字、字体与排版方式：未启用 text_fit 时为单行；否则可能换行或截断（各行以换行符连接）。
+
+        启用字形图集时，字号向下取整为原生网格字号的整数倍（只会变小，仍放得进方框）。
+
+        Args:
+            text (str): 文字
+            profile (StyleProfile): 样式档案
+            font_size (int): 可选，已求解的单行字号
+
+        Returns:
+            tuple[str, ImageFont.FreeTypeFont, int, TextShaping, GlyphAtlas | None]:
+                (绘制文字, 字体, 行间距, 排版方式, 字形图集；不使用图集时为 None)
+        """
+        shaping = profile.shaping_for(text)
+        if self.text_fit['mode'] == 'none':
+            fitter = None
+            lines_text, size = text, self._fit_font(text, profile, font_size).size
         else:
-            sw = int(base.get('stroke_width', 0) or 0)
-            if sw == 0:
-                sw = 1
-            base['stroke_width'] = sw
+            fitter = self.text_fitter(profile)
+            fitted = fitter.fit(text, font_size)
+            if not fitted.fits:
+                logger.warning(f"文字在最小字号下仍超出方框: {text}")
+            lines_text, size = '\n'.join(fitted.lines), fitted.font_size
 
-        # 默认描边颜色与文字颜色一致
-        if 'stroke_color' not in base or base.get('stroke_color') is None:
-            base['stroke_color'] = base.get('color')
+        atlas = self.atlas_for(profile)
+        if atlas is not None:
+            snapped = atlas.snap(size)
+            if atlas.supports(lines_text, snapped, shaping):
+                size = snapped
+            else:
+                atlas = None
+        spacing = fitter.spacing(size) if fitter is not None else 0
+        return lines_text, profile.get_font(size, shaping.engine), spacing, shaping, atlas
 
-        return base
+    def _draw_text(self, image, xy, profile, layout):
+        """
+        在图片上绘制 _layout_text 排好的文字；有字形图集时用图集绘制，否则由 FreeType 绘制。
 
-    def choose_font_path(self, text):
+        说明：
+        - 当存在描边(stroke)时，文字的视觉边界会随 stroke 增加，
+          使用 anchor='mm'/'lm'/'rm' 以边界框为参考点进行定位，可确保居中稳定。
+        - 多行文字按 text_alignment 对齐各行。
+        """
+        text, font, spacing, shaping, atlas = layout
+        align = self.config.get('text_alignment', 'center')
+        if atlas is not None:
+            atlas.draw(image, xy, text, font, profile.color, anchor=profile.anchor, spacing=spacing, align=align,
+                       stroke_width=profile.stroke_width, stroke_fill=profile.stroke_color)
+            return
+        ImageDraw.Draw(image).text(
+            xy,
+            text,
+            font=font,
+            fill=profile.color,
+            stroke_width=profile.stroke_width,
+            stroke_fill=profile.stroke_color,
+            anchor=profile.anchor,
+            spacing=spacing,
+            align=align,
+            direction=shaping.direction,
+            language=shaping.language
+        )
+
+    def _text_bbox(self, xy, profile, layout):
+        """
+        文字（含描边）的边界，与 _draw_text 的绘制方式一致；多行文字的边界可能为小数，向外取整。
+
+        Returns:
+            tuple[int, int, int, int]: (x0, y0, x1, y1)
         """
-        根据文本内容选择字体路径。
+        text, font, spacing, shaping, atlas = layout
+        align = self.config.get('text_alignment', 'center')
+        if atlas is not None:
+            x0, y0, x1, y1 = atlas.textbbox(xy, text, font, anchor=profile.anchor, spacing=spacing, align=align,
+                                            stroke_width=profile.stroke_width)
+        else:
+            x0, y0, x1, y1 = _MEASURE_DRAW.textbbox(xy, text, font=font, stroke_width=profile.stroke_width,
+                                                    anchor=profile.anchor, spacing=spacing, align=align,
+                                                    direction=shaping.direction, language=shaping.language)
+        return math.floor(x0), math.floor(y0), math.ceil(x1), math.ceil(y1)
 
-        规则：
-        - 若文本全部为 ASCII 字符（英文、数字、常见符号、空格等），使用配置中的 font_path_latin
-        - 否则（包含非 ASCII 字符，例如中文、日文、韩文等），使用配置中的 font_path_non_latin
-        - 若未配置上述两项，则回退使用 font_path
+    def render_id_image(self, user_id, profile_index=None, font_size=None):
+        """
+        在内存中为单个用户ID绘制图片（不写入磁盘）。
 
         Args:
-            text (str): 需要绘制的文本
+            user_id (str): 用户ID
+            profile_index (int): 样式档案索引；缺省时按文本类型（英文/非英文）自动选择
+            font_size (int): 可选，已求解的字号；缺省时自动计算
 
         Returns:
-            str: 选择后的字体文件路径
+            Image.Image: 绘制完成的 RGBA 图片
         """
-        try:
-            # 优先使用专用配置项
-            font_path_latin = self.config.get('font_path_latin')
-            font_path_non_latin = self.config.get('font_path_non_latin')
+        return self._render(user_id, profile_index, font_size=font_size)[0]
+
+    def _render(self, user_id, profile_index=None, with_dirty_box=False, font_size=None):
+        """
+        绘制单个用户ID，可选返回与背景不同的区域（方框与文字实际边界的并集）。
+
+        Args:
+            user_id (str): 用户ID
+            profile_index (int): 样式档案索引；缺省时自动选择
+            with_dirty_box (bool): 是否计算变化区域（派生变体时需要）
+            font_size (int): 可选，已求解的字号
+
+        Returns:
+            tuple[Image.Image, tuple | None]: (图片, 变化区域 (x0, y0, x1, y1) 或 None)
+        """
+        text = str(user_id)
+        profile = self._profile_for(text, profile_index)
 
-            is_ascii = self.is_ascii_text(text)
+        # 复制已缓存的背景图片
+        background = self.load_background().copy()
 
-            if is_ascii and font_path_latin:
-                return font_path_latin
-            if (not is_ascii) and font_path_non_latin:
-                return font_path_non_latin
+        layout = self._layout_text(text, profile, font_size)
 
-            # 回退到默认字体路径
-            return self.font_path
-        except Exception as e:
-            logger.warning(f"字体选择失败，回退默认字体: {e}")
-            return self.font_path
-    
-    def create_id_image(self, user_id, output_filename):
+        # 绘制文字（使用 Pillow anchor 实现更稳定的居中/对齐）
+        self._draw_text(background, profile.text_xy, profile, layout)
+
+        dirty_box = None
+        if with_dirty_box:
+            # 文字在最小字号下仍可能超出方框，因此取方框与文字实际边界的并集
+            text_box = self.config['text_box']
+            bbox = self._text_bbox(profile.text_xy, profile, layout)
+            dirty_box = (
+                min(text_box['x'], bbox[0]),
+                min(text_box['y'], bbox[1]),
+                max(text_box['x'] + text_box['width'], bbox[2]),
+                max(text_box['y'] + text_box['height'], bbox[3]),
+            )
+        return background, dirty_box
+
+    def render_id_variants(self, user_id, profile_index=None, font_size=None):
+        """
+        在内存中绘制单个用户ID，并从同一次绘制结果派生配置中的全部输出变体。
+
+        Args:
+            user_id (str): 用户ID
+            profile_index (int): 样式档案索引；缺省时自动选择
+            font_size (int): 可选，已求解的字号
+
+        Returns:
+            list[tuple[OutputVariant | None, Image.Image]]: 第一项为全尺寸图片（变体为 None），其后为各变体
+        """
+        image, dirty_box = self._render(user_id, profile_index, with_dirty_box=bool(self.variants),
+                                        font_size=font_size)
+        results = [(None, image)]
+        background = self.load_background()
+        for variant in self.variants:
+            results.append((variant, self.variant_renderer.derive(variant, image, background, dirty_box)))
+        return results
+
+
+    def render_id_patch(self, user_id, profile_index=None, crop='box', font_size=None):
+        """
+        只绘制文字所在区域（局部图块），并返回其在背景中的位置；客户端将图块贴回模板即可得到完整图片。
+
+        只裁剪并复制背景的对应区域后在其上绘制，结果与完整图片的同一区域逐像素一致，
+        但无需复制整张背景，编码的数据量也小得多。
+
+        Args:
+            user_id (str): 用户ID
+            profile_index (int): 样式档案索引；缺省时自动选择
+            crop (str): 'box' 输出方框大小的图块（文字超出方框时自动扩展到文字边界）；
+                        'tight' 只输出文字实际边界
+            font_size (int): 可选，已求解的字号
+
+        Returns:
+            tuple[Image.Image, tuple[int, int, int, int]]: (图块, 在背景中的区域 (x0, y0, x1, y1))
+        """
+        text = str(user_id)
+        profile = self._profile_for(text, profile_index)
+        layout = self._layout_text(text, profile, font_size)
+        background = self.load_background()
+
+        x0, y0, x1, y1 = self._patch_region(self._text_bbox(profile.text_xy, profile, layout), crop, background)
+        patch = background.crop((x0, y0, x1, y1))
+        self._draw_text(patch, (profile.text_xy[0] - x0, profile.text_xy[1] - y0), profile, layout)
+        return patch, (x0, y0, x1, y1)
+
+    def _patch_region(self, bbox, crop, background):
+        """
+        局部图块的区域：'box' 为方框与文字边界的并集，'tight' 为文字边界；限制在背景范围内，并保证至少 1x1。
+
+        Args:
+            bbox (tuple[int, int, int, int]): 文字（含描边）的边界
+            crop (str): 'box' 或 'tight'
+            background (Image.Image): 背景图片
+
+        Returns:
+            tuple[int, int, int, int]: 图块在背景中的区域 (x0, y0, x1, y1)
+        """
+        if crop == 'tight':
+            region = bbox
+        else:
+            text_box = self.config['text_box']
+            region = (
+                min(text_box['x'], bbox[0]),
+                min(text_box['y'], bbox[1]),
+                max(text_box['x'] + text_box['width'], bbox[2]),
+                max(text_box['y'] + text_box['height'], bbox[3]),
+            )
+        x0 = min(max(0, region[0]), background.width - 1)
+        y0 = min(max(0, region[1]), background.height - 1)
+        x1 = max(x0 + 1, min(background.width, region[2]))
+        y1 = max(y0 + 1, min(background.height, region[3]))
+        return x0, y0, x1, y1
+
+    def _text_masks(self, xy, profile, layout):
+        """
+        光栅化文字与描边的覆盖遮罩（与 _draw_text 的绘制结果一致），可按不同颜色多次合成。
+
+        FreeType 绘制时，遮罩即以 255 将文字绘制到空白的 'L' 画布上得到的覆盖度（内部同样经 font.getmask2 光栅化），
+        用颜色按遮罩粘贴与直接 draw.text 的结果逐像素一致；字形图集绘制时直接使用图集的二值遮罩。
+
+        Returns:
+            tuple[tuple[int, int, int, int], Image.Image, Image.Image | None] | None:
+                (遮罩区域, 文字遮罩, 描边遮罩（含文字部分，无描边时为 None))；没有可见文字时返回 None
+        """
+        text, font, spacing, shaping, atlas = layout
+        align = self.config.get('text_alignment', 'center')
+        if atlas is not None:
+            return atlas.render_masks(xy, text, font, anchor=profile.anchor, spacing=spacing, align=align,
+                                      stroke_width=profile.stroke_width)
+        box = self._text_bbox(xy, profile, layout)
+        size = (box[2] - box[0], box[3] - box[1])
+        if size[0] <= 0 or size[1] <= 0:
+            return None
+
+        def coverage(stroke_width):
+            mask = Image.new('L', size, 0)
+            ImageDraw.Draw(mask).text((xy[0] - box[0], xy[1] - box[1]), text, font=font, fill=255,
+                                      stroke_width=stroke_width, stroke_fill=255, anchor=profile.anchor,
+                                      spacing=spacing, align=align, direction=shaping.direction,
+                                      language=shaping.language)
+            return mask
+
+        return box, coverage(0), coverage(profile.stroke_width) if profile.stroke_width else None
+
+    @staticmethod
+    def _composite_text(image, masks, color, stroke_color, origin=(0, 0)):
+        """
+        按遮罩用指定颜色合成文字：先描边、再文字（描边颜色与文字颜色相同时只合成描边，与 Pillow 一致）。
+
+        Args:
+            image (Image.Image): 目标图片
+            masks (tuple): _text_masks 的结果
+            color (tuple): 文字颜色
+            stroke_color (tuple): 描边颜色
+            origin (tuple[int, int]): 目标图片左上角在背景中的位置（局部图块时使用）
+        """
+        box, fill_mask, stroke_mask = masks
+        xy = (box[0] - origin[0], box[1] - origin[1])
+        if stroke_mask is None:
+            image.paste(color, xy, fill_mask)
+            return
+        image.paste(stroke_color, xy, stroke_mask)
+        if _rgba(color) != _rgba(stroke_color):
+            image.paste(color, xy, fill_mask)
+
+    def render_color_variants(self, user_id, profile_index=None, font_size=None, crop=None):
+        """
+        绘制单个用户ID的全部颜色版本：字号求解、排版与光栅化只做一次，各颜色只需按遮罩合成。
+
+        Args:
+            user_id (str): 用户ID
+            profile_index (int): 样式档案索引；缺省时自动选择
+            font_size (int): 可选，已求解的字号
+            crop (str): None 绘制完整图片；'box'/'tight' 绘制局部图块（同 render_id_patch）
+
+        Returns:
+            tuple[list[tuple[ColorVariant | None, Image.Image]], tuple[int, int, int, int]]:
+                (各颜色版本（第一项为配置中的颜色，变体为 None）, 区域)；
+                完整图片时区域为变化区域（方框与文字边界的并集），局部图块时为图块在背景中的区域
+        """
+        text = str(user_id)
+        profile = self._profile_for(text, profile_index)
+        layout = self._layout_text(text, profile, font_size)
+        background = self.load_background()
+        masks = self._text_masks(profile.text_xy, profile, layout)
+        bbox = masks[0] if masks is not None else self._text_bbox(profile.text_xy, profile, layout)
+
+        if crop is None:
+            text_box = self.config['text_box']
+            region = (
+                min(text_box['x'], bbox[0]),
+                min(text_box['y'], bbox[1]),
+                max(text_box['x'] + text_box['width'], bbox[2]),
+                max(text_box['y'] + text_box['height'], bbox[3]),
+            )
+            base, origin = background, (0, 0)
+        else:
+            region = self._patch_region(bbox, crop, background)
+            base, origin = background.crop(region), region[:2]
+
+        colors = [(None, profile.color, profile.stroke_color)]
+        colors.extend((v, v.color, v.stroke_color) for v in self.color_variants)
+        results = []
+        for variant, color, stroke_color in colors:
+            image = base.copy()
+            if masks is not None:
+                self._composite_text(image, masks, color, stroke_color, origin)
+            results.append((variant, image))
+        return results, region
+
+    def encode_image(self, image, image_format='PNG', **save_options):
+        """
+        将图片编码为字节串。
+
+        Args:
+            image (Image.Image): 图片
+            image_format (str): 编码格式，例如 PNG / WEBP / JPEG（JPEG 不支持透明通道，会先转换为 RGB）
+            **save_options: 传递给 Image.save 的编码参数，例如 quality=90、compress_level=1
+
+        Returns:
+            bytes: 编码后的图片数据
+        """
+        if image_format.upper() in ('JPEG', 'JPG') and image.mode != 'RGB':
+            image = image.convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, **save_options)
+        return buffer.getvalue()
+
+    def render_id_bytes(self, user_id, image_format='PNG', profile_index=None, **save_options):
+        """
+        在内存中绘制单个用户ID并编码为字节串，可直接上传或转发，无需经过磁盘。
+
+        Args:
+            user_id (str): 用户ID
+            image_format (str): 编码格式
+            profile_index (int): 样式档案索引；缺省时自动选择
+            **save_options: 传递给 Image.save 的编码参数
+
+        Returns:
+            bytes: 编码后的图片数据
+        """
+        return self.encode_image(self.render_id_image(user_id, profile_index), image_format, **save_options)
+
+    def iter_rendered_images(self, user_ids=None, image_format='PNG', **save_options):
+        """
+        逐行惰性生成编码后的图片：每次只在内存中保留一张图片，适合流式上传到其他系统。
+
+        Args:
+            user_ids (iterable): 用户ID序列；缺省时读取配置中的 Excel 文件
+            image_format (str): 编码格式
+            **save_options: 传递给 Image.save 的编码参数
+
+        Yields:
+            tuple[int, str, bytes]: (行编号, 用户ID, 图片数据)，行编号从 1 开始
+        """
+        if user_ids is None:
+            user_ids = self.read_excel_data()
+        for i, user_id in enumerate(user_ids, 1):
+            text = str(user_id)
+            yield i, text, self.render_id_bytes(text, image_format, **save_options)
+
+    def create_id_image(self, user_id, output_filename, profile_index=None, font_size=None):
         """
         为单个用户ID创建图片
         
         Args:
             user_id (str): 用户ID
             output_filename (str): 输出文件名
+            profile_index (int): 样式档案索引；缺省时按文本类型（英文/非英文）自动选择
+            font_size (int): 可选，已求解的字号（批量生成时预先求解）；缺省时自动计算
+
+        Returns:
+            tuple | None: 局部图块模式（output_mode=patch）下返回图块在背景中的区域 (x0, y0, x1, y1)；完整图片模式返回 None
         """
         try:
-            # 打开背景图片
-            background = Image.open(self.background_path).convert('RGBA')
-            
-            # 创建绘图对象
-            draw = ImageDraw.Draw(background)
-            
-            # 获取配置参数
-            text_box = self.config['text_box']
-            # 根据文本类型（英文/非英文）合并并获取字体设置
-            font_settings = self.get_font_settings_for_text(str(user_id))
-            padding = self.config['padding']
-            
-            # 计算实际可用空间（减去内边距）
-            available_width = text_box['width'] - 2 * padding
-            available_height = text_box['height'] - 2 * padding
-
-            # 读取加粗/描边配置（已在 font_settings 中处理默认值）
-            stroke_width = font_settings.get('stroke_width', 0)
-
-            # 根据文本内容选择字体路径（英文/非英文）
-            selected_font_path = self.choose_font_path(str(user_id))
-
-            # 计算合适的字体大小
-            font_size = self.calculate_font_size(
-                str(user_id),
-                selected_font_path,
-                available_width,
-                available_height,
-                font_settings['max_font_size'],
-                font_settings['min_font_size'],
-                stroke_width=stroke_width
-            )
-            
-            # 创建字体对象
-            font = ImageFont.truetype(selected_font_path, font_size)
-            
-            # 使用更准确的方法获取文字尺寸和位置
-            # 创建临时绘图对象来测量文字
-            temp_img = Image.new('RGB', (text_box['width'], text_box['height']), 'white')
-            temp_draw = ImageDraw.Draw(temp_img)
-            
-            # 获取文字边界框（相对于(0,0)位置）
-            bbox = temp_draw.textbbox((0, 0), str(user_id), font=font, stroke_width=stroke_width)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            # 获取字体的度量信息
-            ascent, descent = font.getmetrics()
-            total_font_height = ascent + descent
-
-            # 计算文字位置（使用 Pillow anchor 实现更稳定的居中/对齐）
-            # 说明：
-            # - 当存在描边(stroke)时，文字的视觉边界会随 stroke 增加，
-            #   使用 anchor='mm'/'lm'/'rm' 以边界框为参考点进行定位，可确保居中稳定。
-            if self.config['text_alignment'] == 'center':
-                # 中心点坐标（方框中心）
-                text_x = text_box['x'] + text_box['width'] // 2
-                text_y = text_box['y'] + text_box['height'] // 2
-                anchor = 'mm'
-            elif self.config['text_alignment'] == 'left':
-                # 左对齐并垂直居中（使用中线作为 anchor 的垂直参考）
-                text_x = text_box['x'] + padding
-                text_y = text_box['y'] + text_box['height'] // 2
-                anchor = 'lm'
-            else:  # right
-                # 右对齐并垂直居中
-                text_x = text_box['x'] + text_box['width'] - padding
-                text_y = text_box['y'] + text_box['height'] // 2
-                anchor = 'rm'
-            
-            # 绘制文字
-            # 读取描边颜色（若未配置则与文字颜色一致，已在 font_settings 默认处理）
-            stroke_color = font_settings.get('stroke_color', font_settings['color'])
-
-            draw.text(
-                (text_x, text_y),
-                str(user_id),
-                font=font,
-                fill=tuple(font_settings['color']),
-                stroke_width=stroke_width,
-                stroke_fill=tuple(stroke_color),
-                anchor=anchor
-            )
-            
-            # 保存图片
-            output_path = os.path.join(self.output_dir, output_filename)
-            background.save(output_path, 'PNG')
-            logger.info(f"成功生成图片: {output_path}")
+            if self.color_variants:
+                return self._create_color_variant_images(user_id, output_filename, profile_index, font_size)
+
+            if self.output_mode == 'patch':
+                patch, region = self.render_id_patch(user_id, profile_index, crop=self.patch_crop,
+                                                     font_size=font_size)
+                output_path = os.path.join(self.output_dir, output_filename)
+                self._ensure_parent_dir(output_path)
+                patch.save(output_path, 'PNG')
+                logger.info(f"成功生成图块: {output_path} @ {region[:2]}")
+                return region
+
+            for variant, image in self.render_id_variants(user_id, profile_index, font_size):
+                # 保存图片（输出文件名可包含子目录，首次使用时创建）
+                if variant is None:
+                    output_path = os.path.join(self.output_dir, output_filename)
+                    self._ensure_parent_dir(output_path)
+                    image.save(output_path, 'PNG')
+                    logger.info(f"成功生成图片: {output_path}")
+                else:
+                    output_path = os.path.join(self.output_dir, variant.relative_path(output_filename))
+                    self._ensure_parent_dir(output_path)
+                    variant.prepare_for_save(image).save(output_path, variant.image_format, **variant.options)
             
         except Exception as e:
             logger.error(f"生成图片失败 ({user_id}): {e}")
             raise
-    
+        return None
+
+    def _create_color_variant_images(self, user_id, output_filename, profile_index=None, font_size=None):
+        """
+        为单个用户ID生成全部颜色版本（配置中的颜色在输出目录下，各颜色变体在 <变体名>/ 子目录下），
+        完整图片模式下每个颜色版本同样派生尺寸变体。
+
+        Returns:
+            tuple | None: 局部图块模式下返回图块区域（各颜色相同）；完整图片模式返回 None
+        """
+        crop = self.patch_crop if self.output_mode == 'patch' else None
+        images, region = self.render_color_variants(user_id, profile_index, font_size, crop)
+        background = self.load_background()
+        for color, image in images:
+            def place(filename):
+                return filename if color is None else color.relative_path(filename)
+
+            output_path = os.path.join(self.output_dir, place(output_filename))
+            self._ensure_parent_dir(output_path)
+            image.save(output_path, 'PNG')
+            if crop is None:
+                for variant in self.variants:
+                    variant_path = os.path.join(self.output_dir, place(variant.relative_path(output_filename)))
+                    self._ensure_parent_dir(variant_path)
+                    derived = self.variant_renderer.derive(variant, image, background, region)
+                    variant.prepare_for_save(derived).save(variant_path, variant.image_format, **variant.options)
+        logger.info(f"成功生成图片: {os.path.join(self.output_dir, output_filename)}（{len(images)} 种颜色）")
+        return region if crop is not None else None
+
+    def build_render_rows(self, user_ids):
+        """
+        将用户ID列表转换为紧凑的渲染行：(编号, 用户ID, 样式档案索引)。
+
+        行只携带档案索引而非完整的字体设置，便于批量调度或传递给工作进程。
+
+        Args:
+            user_ids (list): 用户ID列表
+
+        Returns:
+            list[tuple[int, str, int]]: 渲染行列表，编号从 1 开始
+        """
+        return [(i, str(user_id), profile_index_for_text(user_id)) for i, user_id in enumerate(user_ids, 1)]
+
+    def make_output_layout(self, total_rows):
+        """
+        根据配置中的 output_layout 创建输出布局（编号位数按总行数自动确定）。
+
+        Args:
+            total_rows (int): 本次批量的总行数
+
+        Returns:
+            OutputLayout: 输出布局
+        """
+        return OutputLayout(self.config.get('output_layout'), total_rows)
+
+    def build_output_filename(self, row_number, user_id, layout=None):
+        """
+        生成输出文件的相对路径，例如：001_Xlmy.png（编号在前便于排序，并清理文件名中的特殊字符）。
+        启用子目录分桶时路径包含子目录，例如：a3/00042_Xlmy.png。
+
+        Args:
+            row_number (int): 行编号（从 1 开始）
+            user_id (str): 用户ID
+            layout (OutputLayout): 输出布局；缺省时使用配置中的布局（编号至少三位）
+
+        Returns:
+            str: 相对于输出目录的路径
+        """
+        if layout is None:
+            layout = self.make_output_layout(row_number)
+        return layout.relative_path(row_number, user_id)
+
+    def output_paths_for(self, output_filename, output_dir=None):
+        """
+        返回一行在当前配置下写出的全部输出文件路径（全尺寸图片、各尺寸变体及各颜色版本；尺寸变体只在完整图片模式下生成）。
+
+        Args:
+            output_filename (str): 全尺寸图片的相对路径
+            output_dir (str): 输出目录；缺省时使用当前配置的输出目录
+
+        Returns:
+            list[str]: 输出文件路径列表
+        """
+        output_dir = output_dir or self.output_dir
+        variants = self.variants if self.output_mode == 'full' else ()
+        filenames = [output_filename] + [v.relative_path(output_filename) for v in variants]
+        filenames += [c.relative_path(name) for c in self.color_variants for name in filenames]
+        return [os.path.join(output_dir, name) for name in filenames]
+
+    def _ensure_parent_dir(self, output_path):
+        """确保输出文件所在目录存在（已创建的目录会被记录，避免逐张重复检查）"""
+        parent = os.path.dirname(output_path)
+        if parent and parent not in self._made_dirs:
+            os.makedirs(parent, exist_ok=True)
+            self._made_dirs.add(parent)
+
+    def open_output_index(self):
+        """
+        若配置了 output_layout.index_file，则创建索引写入器（路径相对于输出目录）。
+
+        Returns:
+            OutputIndexWriter | None: 索引写入器；未配置时返回 None
+        """
+        index_file = (self.config.get('output_layout') or {}).get('index_file')
+        if not index_file:
+            return None
+        return OutputIndexWriter(os.path.join(self.output_dir, index_file))
+
+    def write_patch_manifest(self, placements):
+        """
+        写出局部图块清单 patches.json（位于输出目录），包含模板的 SHA-256 与每个图块的偏移。
+
+        Args:
+            placements (iterable): (行号, 用户ID, 相对路径, (x0, y0, x1, y1)) 序列
+        """
+        background = self.load_background()
+        write_patch_manifest(
+            os.path.join(self.output_dir, PATCH_MANIFEST_NAME),
+            self.background_path,
+            background.size,
+            self.config['text_box'],
+            placements
+        )
+
+    def generate_imposed_sheets(self, rows, font_sizes, index=None):
+        """
+        拼版模式：逐张绘制卡片并排到纸张页面上，排满一页立即写出（多页 PDF 或 PNG/TIFF 页面）。
+
+        卡片按成品尺寸缩放时只缩放文字所在区域（与多分辨率变体相同的局部缩放），再贴到页面模板的对应卡位。
+
+        Args:
+            rows (list[tuple[int, str, int]]): 渲染行
+            font_sizes (dict): 行编号 -> 已求解的字号
+            index (OutputIndexWriter): 可选，索引写入器（路径记录为卡片所在页面）
+
+        Returns:
+            int: 拼版的卡片数量
+        """
+        background = self.load_background()
+        layout = ImpositionLayout(self.imposition, background.size)
+        variant = layout.card_variant
+        card_background = self.variant_renderer.scaled_background(variant, background)
+        total_pages = layout.page_count(len(rows))
+        logger.info(f"拼版: 每页 {layout.cols}x{layout.rows} 张，页面 {layout.page_size[0]}x{layout.page_size[1]}px，"
+                    f"卡片 {layout.card_size[0]}x{layout.card_size[1]}px，共 {total_pages} 页")
+
+        with open_sheet_writer(self.imposition, self.output_dir, total_pages) as writer:
+            imposer = SheetImposer(layout, writer, card_background, len(rows))
+            for i, user_id, profile_index in rows:
+                image, dirty_box = self._render(user_id, profile_index, with_dirty_box=True,
+                                                font_size=font_sizes.get(i))
+                page_number = imposer.add(self.variant_renderer.derive_region(variant, image, dirty_box))
+                if index is not None:
+                    index.write(i, user_id, writer.page_ref(page_number))
+                if i % 10 == 0 or i == len(rows):
+                    logger.info(f"进度: {i}/{len(rows)} ({i/len(rows)*100:.1f}%)，第 {page_number}/{total_pages} 页")
+            imposer.flush()
+        return len(rows)
+
     def generate_all_images(self):
         """
         为所有用户ID生成图片
+
+        Returns:
+            int: 生成的图片数量
         """
         try:
             # 读取用户ID数据
             user_ids = self.read_excel_data()
+            rows = self.build_render_rows(user_ids)
+            layout = self.make_output_layout(len(rows))
+            index = self.open_output_index()
+            placements = []
+            # 整列一次性求解字号
+            font_sizes = self.solve_font_sizes(rows)
             
-            logger.info(f"开始生成 {len(user_ids)} 张图片...")
+            logger.info(f"开始生成 {len(rows)} 张图片...")
             
-            # 为每个用户ID生成图片
-            for i, user_id in enumerate(user_ids, 1):
-                # 清理文件名中的特殊字符
-                safe_filename = str(user_id).replace(' ', '_').replace('/', '_').replace('\\', '_')
-                # 为方便排序，将数字编号放在前面，例如：001_Xlmy.png
-                output_filename = f"{i:03d}_{safe_filename}.png"
-                
-                self.create_id_image(user_id, output_filename)
-                
-                # 显示进度
-                if i % 10 == 0 or i == len(user_ids):
-                    logger.info(f"进度: {i}/{len(user_ids)} ({i/len(user_ids)*100:.1f}%)")
+            if self.output_mode == 'imposition':
+                try:
+                    self.generate_imposed_sheets(rows, font_sizes, index)
+                finally:
+                    if index is not None:
+                        index.close()
+                logger.info(f"拼版完成！输出目录: {self.output_dir}")
+                return len(rows)
+
+            try:
+                if self.workers > 1 and len(rows) > 1:
+                    # 多进程：文件名按原始行号预先确定，按样式分组调度
+                    tasks = [(i, user_id, profile_index, self.build_output_filename(i, user_id, layout),
+                              font_sizes.get(i)) for i, user_id, profile_index in rows]
+                    results = render_rows_parallel(self, tasks, min(self.workers, len(rows)))
+                    for i, user_id, output_filename, region in results:
+                        if index is not None:
+                            index.write(i, user_id, output_filename)
+                        if region is not None:
+                            placements.append((i, user_id, output_filename, region))
+                else:
+                    # 为每个用户ID生成图片
+                    for i, user_id, profile_index in rows:
+                        output_filename = self.build_output_filename(i, user_id, layout)
+
+                        region = self.create_id_image(user_id, output_filename, profile_index=profile_index,
+                                                      font_size=font_sizes.get(i))
+                        if index is not None:
+                            index.write(i, user_id, output_filename)
+                        if region is not None:
+                            placements.append((i, user_id, output_filename, region))
+
+                        # 显示进度
+                        if i % 10 == 0 or i == len(rows):
+                            logger.info(f"进度: {i}/{len(rows)} ({i/len(rows)*100:.1f}%)")
+            finally:
+                if index is not None:
+                    index.close()
+            if self.output_mode == 'patch':
+                self.write_patch_manifest(placements)
             
             logger.info(f"所有图片生成完成！输出目录: {self.output_dir}")
+            return len(rows)
             
         except Exception as e:
             logger.error(f"批量生成图片失败: {e}")
             raise
 
 
+def parse_args(argv=None):
+    """
+    解析命令行参数（均为可选，直接双击运行时使用默认值）。
+
+    Args:
+        argv (list): 参数列表，默认读取 sys.argv
+
+    Returns:
+        argparse.Namespace: 解析结果
+    """
+    parser = argparse.ArgumentParser(description="ID填充图片生成器")
+    parser.add_argument('--config', default='config.json', help="配置文件路径（默认 config.json）")
+    parser.add_argument('--watch', action='store_true',
+                        help="监视模式：持续监视 Excel、配置、字体与背景图片，修改后只重新生成受影响的图片")
+    parser.add_argument('--interval', type=float, default=0.5, help="监视模式的轮询间隔（秒，默认 0.5）")
+    parser.add_argument('--jobs', metavar='JOB_FILE',
+                        help="多任务模式：按任务文件（JSON）在同一进程中依次运行多个任务，共享字体与背景缓存")
+    parser.add_argument('--workers',
+                        help="工作进程数（正整数或 auto），覆盖配置文件中的 workers")
+    parser.add_argument('--preview', nargs='?', const='preview.png', metavar='PATH',
+                        help="预览模式：抽取最长、最小字号、非英文及随机的若干行，缩小绘制成一张联系表（默认 preview.png），不生成整批图片")
+    return parser.parse_args(argv)
+
+
 def main():
     """主函数"""
+    args = parse_args()
+    if args.jobs:
+        from batch_jobs import main as run_jobs_main  # 函数级导入，避免循环依赖
+        try:
+            failures = run_jobs_main(args.jobs)
+        finally:
+            wait_for_exit_prompt()
+        # 有任务失败时以非零退出码结束，便于无人值守的调度程序判断
+        sys.exit(1 if failures else 0)
+    if args.watch:
+        from watch_mode import BatchWatcher  # 函数级导入，避免循环依赖
+        BatchWatcher(args.config, interval=args.interval).run()
+        return
+
     try:
         # 创建生成器实例
-        generator = IDFillGenerator()
-        
+        overrides = None
+        if args.workers:
+            overrides = {'workers': 'auto' if args.workers == 'auto' else int(args.workers)}
+        generator = IDFillGenerator(args.config, overrides=overrides)
+
+        if args.preview:
+            render_preview(generator, args.preview)
+            print("=== 预览完成 ===")
+            print(f"联系表: {args.preview}")
+            print("确认效果后去掉 --preview 重新运行，生成整批图片")
+            return
+
         # 生成所有图片
         generator.generate_all_images()
         
@@ -411,4 +1179,6 @@ def wait_for_exit_prompt():
 
 
 if __name__ == "__main__":
+    # 打包为 exe 后多进程生成需要 freeze_support
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,526 @@
+"""
+拼版输出模块
+将绘制好的卡片按行列排到 A4/A3 等纸张页面上（页边距、出血、裁切线），直接在内存中拼版，
+逐页写出多页 PDF 或 PNG/TIFF 页面图片：任意时刻只保留一页页面图像，超大批量时内存占用也保持不变。
+"""
+
+import io
+import os
+import zlib
+
+from PIL import Image, ImageDraw
+
+from output_variants import OutputVariant
+
+
+# 纸张尺寸（毫米，纵向）
+PAGE_SIZES_MM = {
+    'A5': (148.0, 210.0),
+    'A4': (210.0, 297.0),
+    'A3': (297.0, 420.0),
+    'LETTER': (215.9, 279.4),
+}
+
+# 默认拼版设置
+DEFAULT_IMPOSITION = {
+    'page_size': 'A4',
+    'orientation': 'auto',
+    'dpi': 300,
+    'margin_mm': 10,
+    'bleed_mm': 3,
+    'gap_mm': 0,
+    'card_width_mm': None,
+    'resample': 'lanczos',
+    'crop_marks': True,
+    'mark_length_mm': 5,
+    'format': 'PDF',
+    'filename': 'sheets',
+    'jpeg_quality': None,
+}
+
+# 裁切线与出血边缘之间的间隙、裁切线线宽（毫米）
+MARK_GAP_MM = 1.0
+MARK_WIDTH_MM = 0.1
+
+# 页面图片格式 -> 文件扩展名
+SHEET_FORMATS = {
+    'PDF': 'pdf',
+    'PNG': 'png',
+    'TIFF': 'tif',
+}
+
+
+def mm_to_px(mm, dpi):
+    """毫米换算为像素（四舍五入）"""
+    return int(round(mm * dpi / 25.4))
+
+
+def parse_imposition(config):
+    """
+    解析并校验配置中的 imposition 字段（缺省项使用 DEFAULT_IMPOSITION）。
+
+    Args:
+        config (dict): 配置信息
+
+    Returns:
+        dict: 合并后的拼版设置
+    """
+    settings = config.get('imposition') or {}
+    if not isinstance(settings, dict):
+        raise ValueError("配置无效: imposition 必须为字典")
+    merged = dict(DEFAULT_IMPOSITION)
+    merged.update(settings)
+
+    page_size = merged['page_size']
+    if isinstance(page_size, str):
+        if page_size.upper() not in PAGE_SIZES_MM:
+            raise ValueError(f"配置无效: imposition.page_size 必须为 {'/'.join(PAGE_SIZES_MM)} 或 [宽, 高]（毫米）")
+        merged['page_size'] = PAGE_SIZES_MM[page_size.upper()]
+    elif (not isinstance(page_size, (list, tuple)) or len(page_size) != 2
+          or not all(isinstance(v, (int, float)) and v > 0 for v in page_size)):
+        raise ValueError("配置无效: imposition.page_size 必须为纸张名称或 [宽, 高]（毫米）")
+    else:
+        merged['page_size'] = (float(page_size[0]), float(page_size[1]))
+
+    if merged['orientation'] not in ('portrait', 'landscape', 'auto'):
+        raise ValueError("配置无效: imposition.orientation 必须为 portrait/landscape/auto")
+    if not isinstance(merged['dpi'], (int, float)) or merged['dpi'] <= 0:
+        raise ValueError("配置无效: imposition.dpi 必须为正数")
+    for key in ('margin_mm', 'bleed_mm', 'gap_mm', 'mark_length_mm'):
+        if not isinstance(merged[key], (int, float)) or merged[key] < 0:
+            raise ValueError(f"配置无效: imposition.{key} 不能为负数")
+    card_width = merged['card_width_mm']
+    if card_width is not None and (not isinstance(card_width, (int, float)) or card_width <= 0):
+        raise ValueError("配置无效: imposition.card_width_mm 必须为正数")
+
+    image_format = str(merged['format']).upper()
+    if image_format == 'TIF':
+        image_format = 'TIFF'
+    if image_format not in SHEET_FORMATS:
+        raise ValueError(f"配置无效: imposition.format 必须为 {'/'.join(SHEET_FORMATS)}")
+    merged['format'] = image_format
+
+    quality = merged['jpeg_quality']
+    if quality is not None and (not isinstance(quality, int) or not 1 <= quality <= 95):
+        raise ValueError("配置无效: imposition.jpeg_quality 必须为 1~95 的整数")
+    if not merged['filename'] or not isinstance(merged['filename'], str):
+        raise ValueError("配置无效: imposition.filename 必须为非空字符串")
+
+    # 提前校验滤波器名称
+    OutputVariant('imposition', 1.0, merged['resample'])
+    return merged
+
+
+class ImpositionLayout:
+    """
+    拼版几何：页面像素尺寸、卡片尺寸、行列数与每个卡位的位置（均为页面像素坐标）。
+
+    每个卡位由“成品区（裁切后尺寸）+ 四周出血”组成，卡位之间再留 gap；整个网格在页面内居中。
+    """
+
+    def __init__(self, settings, source_size):
+        """
+        Args:
+            settings (dict): parse_imposition 返回的拼版设置
+            source_size (tuple[int, int]): 全尺寸卡片（背景图片）的像素尺寸
+        """
+        dpi = settings['dpi']
+        self.dpi = dpi
+
+        # 卡片成品尺寸：指定 card_width_mm 时按宽度等比缩放，否则按原像素尺寸以 dpi 输出
+        source_w, source_h = source_size
+        scale = 1.0
+        if settings['card_width_mm'] is not None:
+            scale = mm_to_px(settings['card_width_mm'], dpi) / source_w
+        self.card_variant = OutputVariant('imposition', scale, settings['resample'])
+        self.card_size = self.card_variant.target_size(source_size)
+
+        self.bleed = mm_to_px(settings['bleed_mm'], dpi)
+        self.gap = mm_to_px(settings['gap_mm'], dpi)
+        self.margin = mm_to_px(settings['margin_mm'], dpi)
+        self.crop_marks = bool(settings['crop_marks'])
+        self.mark_length = mm_to_px(settings['mark_length_mm'], dpi)
+        self.mark_offset = self.bleed + mm_to_px(MARK_GAP_MM, dpi)
+        self.mark_width = max(1, mm_to_px(MARK_WIDTH_MM, dpi))
+
+        page_w, page_h = (mm_to_px(v, dpi) for v in settings['page_size'])
+        portrait = (min(page_w, page_h), max(page_w, page_h))
+        landscape = (portrait[1], portrait[0])
+        orientation = settings['orientation']
+        if orientation == 'portrait':
+            page = portrait
+        elif orientation == 'landscape':
+            page = landscape
+        else:
+            # 自动选择能放下更多卡片的方向（数量相同时取纵向）
+            page = landscape if self._capacity(landscape) > self._capacity(portrait) else portrait
+        self.page_size = page
+        self.cols, self.rows = self._grid(page)
+        if self.cols * self.rows == 0:
+            raise ValueError(
+                f"配置无效: imposition 页面 {page[0]}x{page[1]}px 放不下一张卡片 "
+                f"{self.card_size[0]}x{self.card_size[1]}px（请减小 card_width_mm、margin_mm 或 bleed_mm）"
+            )
+        self.per_page = self.cols * self.rows
+
+        cell_w = self.card_size[0] + 2 * self.bleed
+        cell_h = self.card_size[1] + 2 * self.bleed
+        self.pitch = (cell_w + self.gap, cell_h + self.gap)
+        used_w = self.cols * cell_w + (self.cols - 1) * self.gap
+        used_h = self.rows * cell_h + (self.rows - 1) * self.gap
+        # 第一个卡位成品区左上角
+        self.origin = ((page[0] - used_w) // 2 + self.bleed, (page[1] - used_h) // 2 + self.bleed)
+
+    def _grid(self, page):
+        """计算页面可放下的 (列数, 行数)"""
+        cell_w = self.card_size[0] + 2 * self.bleed
+        cell_h = self.card_size[1] + 2 * self.bleed
+        avail_w = page[0] - 2 * self.margin
+        avail_h = page[1] - 2 * self.margin
+        cols = max(0, (avail_w + self.gap) // (cell_w + self.gap))
+        rows = max(0, (avail_h + self.gap) // (cell_h + self.gap))
+        return cols, rows
+
+    def _capacity(self, page):
+        cols, rows = self._grid(page)
+        return cols * rows
+
+    def page_count(self, total_cards):
+        """总页数"""
+        return -(-total_cards // self.per_page)
+
+    def slot_origin(self, slot):
+        """
+        卡位成品区左上角的页面坐标（按行优先排列）。
+
+        Args:
+            slot (int): 页内卡位序号（从 0 开始）
+
+        Returns:
+            tuple[int, int]: (x, y)
+        """
+        col = slot % self.cols
+        row = slot // self.cols
+        return self.origin[0] + col * self.pitch[0], self.origin[1] + row * self.pitch[1]
+
+    def crop_mark_boxes(self, count):
+        """
+        计算页面上裁切线的矩形（位于网格外侧的页边距内，对齐每条成品边线）。
+
+        Args:
+            count (int): 本页实际放置的卡片数
+
+        Returns:
+            list[tuple[int, int, int, int]]: 裁切线矩形 (x0, y0, x1, y1)
+        """
+        if not self.crop_marks or count <= 0 or self.mark_length <= 0:
+            return []
+        card_w, card_h = self.card_size
+        half = self.mark_width // 2
+        rows_used = -(-count // self.cols)
+        boxes = []
+
+        for col in range(min(count, self.cols)):
+            # 该列最后一张卡片所在的行（末行可能未排满）
+            last_row = rows_used - 1 if col < count - (rows_used - 1) * self.cols else rows_used - 2
+            x_left, top = self.slot_origin(col)
+            bottom = self.slot_origin(last_row * self.cols + col)[1] + card_h
+            for x in (x_left, x_left + card_w):
+                boxes.append((x - half, top - self.mark_offset - self.mark_length,
+                              x - half + self.mark_width, top - self.mark_offset))
+                boxes.append((x - half, bottom + self.mark_offset,
+                              x - half + self.mark_width, bottom + self.mark_offset + self.mark_length))
+
+        for row in range(rows_used):
+            last_col = min(self.cols, count - row * self.cols) - 1
+            left, y_top = self.slot_origin(row * self.cols)
+            right = self.slot_origin(row * self.cols + last_col)[0] + card_w
+            for y in (y_top, y_top + card_h):
+                boxes.append((left - self.mark_offset - self.mark_length, y - half,
+                              left - self.mark_offset, y - half + self.mark_width))
+                boxes.append((right + self.mark_offset, y - half,
+                              right + self.mark_offset + self.mark_length, y - half + self.mark_width))
+        return boxes
+
+
+def flatten(image):
+    """将图片转换为 RGB（带透明通道时先合成到白色底上）"""
+    if image.mode == 'RGB':
+        return image
+    if 'A' in image.getbands():
+        base = Image.new('RGBA', image.size, 'white')
+        base.alpha_composite(image.convert('RGBA'))
+        return base.convert('RGB')
+    return image.convert('RGB')
+
+
+def add_bleed(card, bleed):
+    """
+    为卡片补出血：将四条边的像素向外延伸 bleed 像素（卡片图片本身没有出血内容）。
+
+    Args:
+        card (Image.Image): 成品尺寸的卡片（RGB）
+        bleed (int): 出血宽度（像素）
+
+    Returns:
+        Image.Image: 尺寸为 (宽 + 2*bleed, 高 + 2*bleed) 的图片
+    """
+    if bleed <= 0:
+        return card
+    w, h = card.size
+    out = Image.new('RGB', (w + 2 * bleed, h + 2 * bleed))
+    out.paste(card, (bleed, bleed))
+    out.paste(card.crop((0, 0, w, 1)).resize((w, bleed)), (bleed, 0))
+    out.paste(card.crop((0, h - 1, w, h)).resize((w, bleed)), (bleed, h + bleed))
+    out.paste(card.crop((0, 0, 1, h)).resize((bleed, h)), (0, bleed))
+    out.paste(card.crop((w - 1, 0, w, h)).resize((bleed, h)), (w + bleed, bleed))
+    for x, y, px, py in ((0, 0, 0, 0), (w + bleed, 0, w - 1, 0),
+                         (0, h + bleed, 0, h - 1), (w + bleed, h + bleed, w - 1, h - 1)):
+        out.paste(card.getpixel((px, py)), (x, y, x + bleed, y + bleed))
+    return out
+
+
+class PdfSheetWriter:
+    """
+    流式多页 PDF 写入器：每页作为一张整页图片写入，写完即释放，文件末尾再写页面树与交叉引用表。
+    """
+
+    def __init__(self, path, dpi, jpeg_quality=None):
+        """
+        Args:
+            path (str): PDF 文件路径
+            dpi (float): 页面图片分辨率（决定页面的物理尺寸）
+            jpeg_quality (int): 可选，使用 JPEG（DCTDecode）压缩页面；缺省为无损 Flate 压缩
+        """
+        self.path = path
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self._file = open(path, 'wb')
+        self._offsets = {}
+        self._pages = []
+        # 对象 1 为 Catalog，对象 2 为页面树（最后写入），其余对象依次编号
+        self._next_id = 3
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+    def _write_object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f'{obj_id} 0 obj\n'.encode('ascii'))
+        self._file.write(body)
+        if stream is not None:
+            self._file.write(b'\nstream\n')
+            self._file.write(stream)
+            self._file.write(b'\nendstream')
+        self._file.write(b'\nendobj\n')
+
+    def _allocate(self, count):
+        first = self._next_id
+        self._next_id += count
+        return range(first, first + count)
+
+    def add_page(self, image):
+        """
+        写入一页。
+
+        Args:
+            image (Image.Image): RGB 页面图片
+        """
+        image_id, content_id, page_id = self._allocate(3)
+        width, height = image.size
+        if self.jpeg_quality is not None:
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=self.jpeg_quality)
+            data = buffer.getvalue()
+            pdf_filter = b'/DCTDecode'
+        else:
+            data = zlib.compress(image.tobytes(), 6)
+            pdf_filter = b'/FlateDecode'
+        self._write_object(
+            image_id,
+            b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB '
+            b'/BitsPerComponent 8 /Filter %s /Length %d >>' % (width, height, pdf_filter, len(data)),
+            data
+        )
+        del data
+
+        # 页面物理尺寸（点，1 英寸 = 72 点）
+        pt_w = width * 72.0 / self.dpi
+        pt_h = height * 72.0 / self.dpi
+        content = f'q {pt_w:.4f} 0 0 {pt_h:.4f} 0 0 cm /Im0 Do Q'.encode('ascii')
+        self._write_object(content_id, b'<< /Length %d >>' % len(content), content)
+        self._write_object(
+            page_id,
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {pt_w:.4f} {pt_h:.4f}] '
+            f'/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>'.encode('ascii')
+        )
+        self._pages.append(page_id)
+
+    def page_ref(self, page_number):
+        """索引文件中记录的页面位置，例如 sheets.pdf#page=3"""
+        return f"{os.path.basename(self.path)}#page={page_number}"
+
+    def close(self):
+        """写出页面树与交叉引用表并关闭文件"""
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self._pages)
+        self._write_object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>'.encode('ascii'))
+        xref_offset = self._file.tell()
+        self._file.write(f'xref\n0 {self._next_id}\n'.encode('ascii'))
+        self._file.write(b'0000000000 65535 f \n')
+        for obj_id in range(1, self._next_id):
+            self._file.write(f'{self._offsets[obj_id]:010d} 00000 n \n'.encode('ascii'))
+        self._file.write(f'trailer\n<< /Size {self._next_id} /Root 1 0 R >>\n'
+                         f'startxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ImageSheetWriter:
+    """页面图片写入器：每页保存为一个 PNG/TIFF 文件（sheets_0001.png ...），并写入 dpi 信息。"""
+
+    def __init__(self, output_dir, stem, image_format, dpi, total_pages):
+        """
+        Args:
+            output_dir (str): 输出目录
+            stem (str): 文件名前缀
+            image_format (str): PNG 或 TIFF
+            dpi (float): 页面分辨率
+            total_pages (int): 总页数（用于确定页码位数）
+        """
+        self.output_dir = output_dir
+        self.stem = stem
+        self.image_format = image_format
+        self.extension = SHEET_FORMATS[image_format]
+        self.dpi = dpi
+        self.pad_width = max(4, len(str(max(total_pages, 1))))
+        self._count = 0
+
+    def page_ref(self, page_number):
+        """页面文件相对于输出目录的路径"""
+        return f"{self.stem}_{page_number:0{self.pad_width}d}.{self.extension}"
+
+    def add_page(self, image):
+        """写入一页"""
+        self._count += 1
+        options = {'compression': 'tiff_lzw'} if self.image_format == 'TIFF' else {}
+        image.save(os.path.join(self.output_dir, self.page_ref(self._count)), self.image_format,
+                   dpi=(self.dpi, self.dpi), **options)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def open_sheet_writer(settings, output_dir, total_pages):
+    """
+    按拼版设置创建页面写入器。
+
+    Args:
+        settings (dict): 拼版设置
+        output_dir (str): 输出目录
+        total_pages (int): 总页数
+
+    Returns:
+        PdfSheetWriter | ImageSheetWriter: 页面写入器
+    """
+    if settings['format'] == 'PDF':
+        return PdfSheetWriter(os.path.join(output_dir, f"{settings['filename']}.pdf"),
+                              settings['dpi'], settings['jpeg_quality'])
+    return ImageSheetWriter(output_dir, settings['filename'], settings['format'], settings['dpi'], total_pages)
+
+
+class SheetImposer:
+    """
+    逐页拼版：页面模板（白底、每个卡位已铺好带出血的卡片背景、裁切线）只生成一次，
+    每张卡片只需把与背景不同的小块区域贴到对应卡位；排满一页立即交给写入器并释放。
+    """
+
+    def __init__(self, layout, writer, card_background, total_cards):
+        """
+        Args:
+            layout (ImpositionLayout): 拼版几何
+            writer: 页面写入器（PdfSheetWriter / ImageSheetWriter）
+            card_background (Image.Image): 成品尺寸的卡片背景
+            total_cards (int): 卡片总数（用于确定最后一页的卡位数）
+        """
+        self.layout = layout
+        self.writer = writer
+        self.card_background = flatten(card_background)
+        self.total_cards = total_cards
+        self._bled_background = add_bleed(self.card_background, layout.bleed)
+        self._templates = {}
+        self._page = None
+        self._page_number = 0
+        self._slot = 0
+        self._placed = 0
+
+    def _template(self, count):
+        """放置 count 张卡片的页面模板（整页与最后一页各生成一次）"""
+        template = self._templates.get(count)
+        if template is None:
+            layout = self.layout
+            template = Image.new('RGB', layout.page_size, 'white')
+            for slot in range(count):
+                x, y = layout.slot_origin(slot)
+                template.paste(self._bled_background, (x - layout.bleed, y - layout.bleed))
+            draw = ImageDraw.Draw(template)
+            for box in layout.crop_mark_boxes(count):
+                draw.rectangle((box[0], box[1], box[2] - 1, box[3] - 1), fill='black')
+            self._templates[count] = template
+        return template
+
+    def add(self, region):
+        """
+        放置下一张卡片。
+
+        Args:
+            region (tuple[Image.Image, tuple[int, int]] | None): 卡片与背景不同的区域（成品尺寸坐标）及其位置；
+                None 表示卡片与背景相同
+
+        Returns:
+            int: 卡片所在页码（从 1 开始）
+        """
+        layout = self.layout
+        if self._page is None:
+            count = min(layout.per_page, self.total_cards - self._placed)
+            self._page = self._template(count).copy()
+            self._page_number += 1
+            self._slot = 0
+
+        x, y = layout.slot_origin(self._slot)
+        if region is not None:
+            patch, (px, py) = region
+            patch = flatten(patch)
+            card_w, card_h = layout.card_size
+            touches_edge = px <= 0 or py <= 0 or px + patch.width >= card_w or py + patch.height >= card_h
+            if touches_edge and layout.bleed > 0:
+                # 文字触及卡片边缘：出血也需包含文字，按整张卡片重新补出血
+                card = self.card_background.copy()
+                card.paste(patch, (px, py))
+                self._page.paste(add_bleed(card, layout.bleed), (x - layout.bleed, y - layout.bleed))
+            else:
+                self._page.paste(patch, (x + px, y + py))
+
+        page_number = self._page_number
+        self._slot += 1
+        self._placed += 1
+        if self._slot >= layout.per_page or self._placed >= self.total_cards:
+            self.flush()
+        return page_number
+
+    def flush(self):
+        """写出当前页（若有）"""
+        if self._page is not None:
+            self.writer.add_page(self._page)
+            self._page = None
@@ -0,0 +1,197 @@
+"""
+批量字号求解模块
+对固定字体，文字宽度与字号近似成线性关系。每种字体只在参考字号下测量一次单字前进宽度（及字偶距），
+即可用 NumPy 一次性预测整列 ID 的字号，再用一两次真实的 textbbox 测量确认，
+结果与 IDFillGenerator.calculate_font_size 的逐级缩小搜索完全一致（同样的 3% 安全边距与描边宽度）。
+"""
+
+import logging
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# 测量单字前进宽度时使用的参考字号（越大，取整误差的相对影响越小）
+REFERENCE_SIZE = 200
+
+# 安全边距（与 calculate_font_size 一致）
+SAFETY_MARGIN = 1.03
+
+# 共享的测量画布：textbbox 的结果与画布尺寸无关，无需每次测量都新建临时图像（其他模块直接导入使用）
+_MEASURE_DRAW = ImageDraw.Draw(Image.new('RGB', (1, 1), 'white'))
+
+
+def measure_safe_size(text, font, stroke_width=0, direction=None, language=None):
+    """
+    测量文字加上安全边距后的尺寸（字号判定的唯一依据，calculate_font_size 与批量求解共用）。
+
+    Args:
+        text (str): 文字
+        font (ImageFont.FreeTypeFont): 字体
+        stroke_width (int): 描边宽度（会增加文字实际宽高）
+        direction (str): 书写方向（仅 RAQM 引擎）
+        language (str): 语言标签（仅 RAQM 引擎）
+
+    Returns:
+        tuple[float, float]: (安全宽度, 安全高度)
+    """
+    bbox = _MEASURE_DRAW.textbbox((0, 0), text, font=font, stroke_width=stroke_width,
+                                  direction=direction, language=language)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+
+    # 获取字体度量信息，用于更准确的高度计算
+    ascent, descent = font.getmetrics()
+    actual_height = ascent + descent
+
+    # 添加安全边距（3%）；当存在描边时，text_height 已包含描边
+    return text_width * SAFETY_MARGIN, max(text_height, actual_height) * SAFETY_MARGIN
+
+
+class GlyphAdvanceTable:
+    """
+    单个字体在参考字号下的单字前进宽度与字偶距表（按需测量并缓存）。
+    """
+
+    def __init__(self, font_path, reference_size=REFERENCE_SIZE):
+        """
+        Args:
+            font_path (str): 字体文件路径
+            reference_size (int): 参考字号
+        """
+        self.reference_size = reference_size
+        self.font = ImageFont.truetype(font_path, reference_size, layout_engine=ImageFont.Layout.BASIC)
+        ascent, descent = self.font.getmetrics()
+        self.line_height = ascent + descent
+        self.advances = {}
+        self.kerning = {}
+
+    def advance(self, ch):
+        """单字在参考字号下的前进宽度"""
+        value = self.advances.get(ch)
+        if value is None:
+            value = self.font.getlength(ch)
+            self.advances[ch] = value
+        return value
+
+    def kern(self, pair):
+        """相邻两字的字偶距修正（整体宽度减去两字宽度之和）"""
+        value = self.kerning.get(pair)
+        if value is None:
+            value = self.font.getlength(pair) - self.advance(pair[0]) - self.advance(pair[1])
+            self.kerning[pair] = value
+        return value
+
+    def reference_widths(self, texts):
+        """
+        计算一组文字在参考字号下的前进宽度总和（含字偶距）。
+
+        Args:
+            texts (list[str]): 文字列表（不能包含空字符串）
+
+        Returns:
+            np.ndarray: 每个文字的参考宽度
+        """
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        total = int(lengths.sum())
+        advances = np.fromiter((self.advance(ch) for t in texts for ch in t), dtype=np.float64, count=total)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        widths = np.add.reduceat(advances, starts)
+
+        pair_counts = lengths - 1
+        pair_total = int(pair_counts.sum())
+        if pair_total:
+            kerns = np.fromiter((self.kern(t[i:i + 2]) for t in texts for i in range(len(t) - 1)),
+                                dtype=np.float64, count=pair_total)
+            # 仅对至少两个字的文字累加字偶距（reduceat 不支持空区间）
+            has_pairs = pair_counts > 0
+            pair_starts = np.concatenate(([0], np.cumsum(pair_counts)[:-1]))[has_pairs]
+            widths[has_pairs] += np.add.reduceat(kerns, pair_starts)
+        return widths
+
+
+class BatchFontSizer:
+    """
+    按样式档案批量求解字号：NumPy 预测 + textbbox 确认。
+    """
+
+    def __init__(self, profile):
+        """
+        Args:
+            profile (StyleProfile): 样式档案（提供字体、描边、字号范围与方框可用尺寸）
+        """
+        self.profile = profile
+        self.table = GlyphAdvanceTable(profile.font_path)
+        self.checks = 0
+
+    def predict(self, texts):
+        """
+        用参考字号下的宽度表线性外推，预测每个文字能放入方框的最大字号。
+
+        Args:
+            texts (list[str]): 文字列表
+
+        Returns:
+            np.ndarray: 预测字号（已限制在 [min_font_size, max_font_size] 内）
+        """
+        p = self.profile
+        ref = self.table.reference_size
+        widths = np.maximum(self.table.reference_widths(texts), 1e-6)
+        by_width = (p.available_width / SAFETY_MARGIN - 2 * p.stroke_width) * ref / widths
+        by_height = p.available_height / SAFETY_MARGIN * ref / max(self.table.line_height, 1)
+        sizes = np.floor(np.minimum(by_width, by_height))
+        return np.clip(sizes, p.min_font_size, p.max_font_size).astype(np.int64)
+
+    def fits(self, text, size):
+        """用真实测量判断文字在该字号下是否放得进方框（使用该文字实际绘制时的排版引擎）"""
+        p = self.profile
+        self.checks += 1
+        shaping = p.shaping_for(text)
+        safe_width, safe_height = measure_safe_size(text, p.get_font(size, shaping.engine), p.stroke_width,
+                                                    shaping.direction, shaping.language)
+        return safe_width <= p.available_width and safe_height <= p.available_height
+
+    def confirm(self, text, predicted):
+        """
+        从预测字号出发确认最终字号：预测准确时只需两次测量（当前字号放得下、大一号放不下）；
+        否则沿需要的方向逐级调整，结果与从最大字号逐级缩小的搜索一致。
+
+        Args:
+            text (str): 文字
+            predicted (int): 预测字号
+
+        Returns:
+            int: 最终字号
+        """
+        p = self.profile
+        size = int(predicted)
+        if self.fits(text, size):
+            while size < p.max_font_size and self.fits(text, size + 1):
+                size += 1
+            return size
+        size -= 1
+        while size >= p.min_font_size:
+            if self.fits(text, size):
+                return size
+            size -= 1
+        logger.warning(f"使用最小字体大小 {p.min_font_size} 对于文字: {text}")
+        return p.min_font_size
+
+    def solve(self, texts):
+        """
+        求解一组文字的字号。
+
+        Args:
+            texts (list[str]): 文字列表
+
+        Returns:
+            list[int]: 与输入顺序对应的字号
+        """
+        texts = [str(t) for t in texts]
+        if not texts:
+            return []
+        # 空字符串无法预测宽度，直接按最大字号确认
+        predictable = [t if t else ' ' for t in texts]
+        predicted = self.predict(predictable)
+        return [self.confirm(t, s) for t, s in zip(texts, predicted)]
@@ -0,0 +1,226 @@
+"""
+输出目录布局模块
+负责生成输出文件的相对路径（编号位数、可选的哈希/区间子目录），并写出 行号-ID-路径 索引文件，
+便于下游系统直接定位图片而无需扫描目录。
+"""
+
+import os
+import csv
+import json
+import hashlib
+import sqlite3
+
+
+# 默认布局：与旧版本一致（平铺、至少三位编号、不写索引）
+DEFAULT_LAYOUT = {
+    'pad_width': 'auto',
+    'buckets': 'none',
+    'hash_chars': 2,
+    'bucket_size': 1000,
+    'index_file': None,
+}
+
+# 局部图块模式的清单文件名（位于输出目录）
+PATCH_MANIFEST_NAME = 'patches.json'
+
+
+def safe_filename(user_id):
+    """
+    清理文件名中的特殊字符（空格、斜杠、反斜杠替换为下划线）。
+
+    Args:
+        user_id (str): 用户ID
+
+    Returns:
+        str: 可用于文件名的字符串
+    """
+    return str(user_id).replace(' ', '_').replace('/', '_').replace('\\', '_')
+
+
+class OutputLayout:
+    """输出路径布局"""
+
+    def __init__(self, settings=None, total_rows=0):
+        """
+        初始化布局
+
+        Args:
+            settings (dict): 配置中的 output_layout 字段，缺省项使用 DEFAULT_LAYOUT
+            total_rows (int): 本次批量的总行数，用于自动确定编号位数
+        """
+        merged = dict(DEFAULT_LAYOUT)
+        merged.update(settings or {})
+
+        pad_width = merged['pad_width']
+        if pad_width == 'auto':
+            # 至少三位（兼容旧的 001_ 命名），超过 999 行时自动加宽，保证按名称排序即为行顺序
+            pad_width = max(3, len(str(max(total_rows, 1))))
+        self.pad_width = int(pad_width)
+
+        self.buckets = merged['buckets']
+        if self.buckets not in ('none', 'hash', 'range'):
+            raise ValueError(f"配置无效: output_layout.buckets 必须为 none/hash/range，当前为 {self.buckets}")
+        self.hash_chars = int(merged['hash_chars'])
+        self.bucket_size = int(merged['bucket_size'])
+        if self.hash_chars <= 0 or self.bucket_size <= 0:
+            raise ValueError("配置无效: output_layout.hash_chars/bucket_size 必须为正数")
+        self.index_file = merged['index_file']
+
+    def bucket_for(self, row_number, user_id):
+        """
+        计算行所在的子目录名；平铺布局返回空字符串。
+
+        - hash：取 ID 的 SHA-1 十六进制前 hash_chars 位（2 位即 256 个子目录，分布均匀且与行号无关）
+        - range：按行号区间分组，例如 bucket_size=1000 时为 0001-1000、1001-2000 ...
+
+        Args:
+            row_number (int): 行编号（从 1 开始）
+            user_id (str): 用户ID
+
+        Returns:
+            str: 子目录名
+        """
+        if self.buckets == 'hash':
+            return hashlib.sha1(str(user_id).encode('utf-8')).hexdigest()[:self.hash_chars]
+        if self.buckets == 'range':
+            start = (row_number - 1) // self.bucket_size * self.bucket_size + 1
+            end = start + self.bucket_size - 1
+            return f"{start:0{self.pad_width}d}-{end:0{self.pad_width}d}"
+        return ''
+
+    def relative_path(self, row_number, user_id, extension='png'):
+        """
+        生成相对于输出目录的文件路径，例如：001_Xlmy.png 或 a3/00042_Xlmy.png。
+
+        Args:
+            row_number (int): 行编号（从 1 开始）
+            user_id (str): 用户ID
+            extension (str): 文件扩展名
+
+        Returns:
+            str: 相对路径
+        """
+        filename = f"{row_number:0{self.pad_width}d}_{safe_filename(user_id)}.{extension}"
+        bucket = self.bucket_for(row_number, user_id)
+        return os.path.join(bucket, filename) if bucket else filename
+
+
+class OutputIndexWriter:
+    """
+    索引文件写入器：记录 行号、ID、相对路径。
+
+    根据扩展名选择格式：.sqlite/.db 写入 SQLite 表 outputs（row 为主键），其余写 CSV（UTF-8 BOM，便于 Excel 打开）。
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): 索引文件路径（会覆盖已存在的文件）
+        """
+        self.path = path
+        self.is_sqlite = os.path.splitext(path)[1].lower() in ('.sqlite', '.db')
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        if self.is_sqlite:
+            if os.path.exists(path):
+                os.remove(path)
+            self._conn = sqlite3.connect(path)
+            self._conn.execute("CREATE TABLE outputs (row INTEGER PRIMARY KEY, id TEXT NOT NULL, path TEXT NOT NULL)")
+            self._conn.execute("CREATE INDEX outputs_id ON outputs (id)")
+        else:
+            self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(['row', 'id', 'path'])
+
+    def write(self, row_number, user_id, relative_path):
+        """写入一条记录（路径统一使用 / 分隔）"""
+        relative_path = relative_path.replace(os.sep, '/')
+        if self.is_sqlite:
+            self._conn.execute("INSERT INTO outputs (row, id, path) VALUES (?, ?, ?)",
+                               (row_number, str(user_id), relative_path))
+        else:
+            self._writer.writerow([row_number, user_id, relative_path])
+
+    def close(self):
+        """提交并关闭索引文件"""
+        if self.is_sqlite:
+            self._conn.commit()
+            self._conn.close()
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def write_output_index(path, entries):
+    """
+    一次性写出完整索引。
+
+    Args:
+        path (str): 索引文件路径
+        entries (iterable): (行号, 用户ID, 相对路径) 序列
+    """
+    with OutputIndexWriter(path) as writer:
+        for row_number, user_id, relative_path in entries:
+            writer.write(row_number, user_id, relative_path)
+
+
+def file_sha256(path):
+    """
+    计算文件的 SHA-256（分块读取，适用于大模板）。
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_patch_manifest(path, template_path, template_size, text_box, placements):
+    """
+    写出局部图块清单（JSON）。
+
+    客户端根据 template.sha256 确认使用的是同一张模板，再把每个图块贴到 (x, y) 处即可还原完整图片。
+
+    Args:
+        path (str): 清单文件路径
+        template_path (str): 模板（背景图片）路径
+        template_size (tuple[int, int]): 模板尺寸
+        text_box (dict): 配置中的文字方框
+        placements (iterable): (行号, 用户ID, 相对路径, (x0, y0, x1, y1)) 序列
+    """
+    manifest = {
+        'template': {
+            'path': template_path.replace(os.sep, '/'),
+            'sha256': file_sha256(template_path),
+            'width': template_size[0],
+            'height': template_size[1],
+        },
+        'text_box': text_box,
+        'patches': [
+            {
+                'row': row_number,
+                'id': str(user_id),
+                'path': relative_path.replace(os.sep, '/'),
+                'x': region[0],
+                'y': region[1],
+                'width': region[2] - region[0],
+                'height': region[3] - region[1],
+            }
+            for row_number, user_id, relative_path, region in placements
+        ],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
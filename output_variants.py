@@ -0,0 +1,313 @@
+"""
+多分辨率输出变体模块
+在同一次绘制中，从全尺寸图片派生缩略图、中等尺寸等变体：
+- 每个变体的背景在每次运行中只缩放一次并缓存；
+- 每张图片只缩放文字所在区域（含滤波器支撑范围的边距），再贴到预缩放背景上，
+  结果与整张图片直接缩放一致（浮点取整误差不超过 2 个色阶），但无需对整张大图重复缩放或重新解码 PNG。
+另支持颜色变体：同一 ID 以不同的文字/描边颜色输出（例如不同活动等级），文字遮罩只光栅化一次。
+"""
+
+import math
+
+from PIL import Image
+
+from style_profiles import _color_tuple
+
+
+# 配置中的滤波器名称 -> (Pillow 滤波器, 滤波器支撑半径)
+# nearest/box 在非整数比例下采样点恰好落在像素边界，局部缩放与整图缩放的取舍可能不同，因此始终整图缩放
+RESAMPLE_FILTERS = {
+    'nearest': (Image.Resampling.NEAREST, 0.5),
+    'box': (Image.Resampling.BOX, 0.5),
+    'bilinear': (Image.Resampling.BILINEAR, 1.0),
+    'hamming': (Image.Resampling.HAMMING, 1.0),
+    'bicubic': (Image.Resampling.BICUBIC, 2.0),
+    'lanczos': (Image.Resampling.LANCZOS, 3.0),
+}
+
+# 图片格式 -> 文件扩展名
+FORMAT_EXTENSIONS = {
+    'PNG': 'png',
+    'JPEG': 'jpg',
+    'WEBP': 'webp',
+    'TIFF': 'tif',
+    'BMP': 'bmp',
+}
+
+
+class OutputVariant:
+    """单个输出变体的配置（名称、缩放比例、滤波器、编码格式与参数）"""
+
+    def __init__(self, name, scale, resample='lanczos', image_format='PNG', options=None):
+        """
+        Args:
+            name (str): 变体名称，同时作为输出子目录名，例如 thumb
+            scale (float): 相对于全尺寸的缩放比例，例如 0.25
+            resample (str): 滤波器名称：nearest/box/bilinear/hamming/bicubic/lanczos
+            image_format (str): 编码格式：PNG/JPEG/WEBP/TIFF/BMP
+            options (dict): 传递给 Image.save 的编码参数，例如 {"quality": 85}
+        """
+        if not name or not isinstance(name, str):
+            raise ValueError("配置无效: output_variants 中每个变体都必须有 name")
+        if not isinstance(scale, (int, float)) or scale <= 0:
+            raise ValueError(f"配置无效: 变体 {name} 的 scale 必须为正数")
+        if resample not in RESAMPLE_FILTERS:
+            raise ValueError(f"配置无效: 变体 {name} 的 resample 必须为 {'/'.join(RESAMPLE_FILTERS)}")
+        image_format = image_format.upper()
+        if image_format == 'JPG':
+            image_format = 'JPEG'
+        if image_format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"配置无效: 变体 {name} 的 format 必须为 {'/'.join(FORMAT_EXTENSIONS)}")
+
+        self.name = name
+        self.scale = float(scale)
+        self.resample = resample
+        self.image_format = image_format
+        self.extension = FORMAT_EXTENSIONS[image_format]
+        self.options = dict(options or {})
+
+    def signature(self):
+        """返回变体配置的签名元组（用于判断配置是否变化）"""
+        return (self.name, self.scale, self.resample, self.image_format, tuple(sorted(self.options.items())))
+
+    def target_size(self, size):
+        """
+        计算变体尺寸。
+
+        Args:
+            size (tuple[int, int]): 全尺寸 (宽, 高)
+
+        Returns:
+            tuple[int, int]: 变体尺寸（至少 1x1）
+        """
+        return (max(1, round(size[0] * self.scale)), max(1, round(size[1] * self.scale)))
+
+    def relative_path(self, output_filename):
+        """
+        变体文件相对于输出目录的路径：<变体名>/<原相对路径，扩展名替换为变体格式>。
+
+        Args:
+            output_filename (str): 全尺寸图片的相对路径
+
+        Returns:
+            str: 变体图片的相对路径
+        """
+        stem = output_filename.rsplit('.', 1)[0]
+        return f"{self.name}/{stem}.{self.extension}"
+
+    def prepare_for_save(self, image):
+        """JPEG/BMP 不支持透明通道，保存前转换为 RGB"""
+        if self.image_format in ('JPEG', 'BMP') and image.mode != 'RGB':
+            return image.convert('RGB')
+        return image
+
+
+def parse_output_variants(config):
+    """
+    解析并校验配置中的 output_variants 列表。
+
+    Args:
+        config (dict): 配置信息
+
+    Returns:
+        tuple[OutputVariant, ...]: 变体列表（未配置时为空）
+    """
+    items = config.get('output_variants') or []
+    if not isinstance(items, list):
+        raise ValueError("配置无效: output_variants 必须为列表")
+    variants = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("配置无效: output_variants 的每一项必须为字典")
+        variants.append(OutputVariant(
+            name=item.get('name'),
+            scale=item.get('scale', 1.0),
+            resample=item.get('resample', 'lanczos'),
+            image_format=item.get('format', 'PNG'),
+            options=item.get('options'),
+        ))
+    names = [v.name for v in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("配置无效: output_variants 的 name 不能重复")
+    return tuple(variants)
+
+
+class ColorVariant:
+    """单个颜色变体的配置（名称、文字颜色与描边颜色）"""
+
+    def __init__(self, name, color, stroke_color=None):
+        """
+        Args:
+            name (str): 变体名称，同时作为输出子目录名，例如 gold
+            color (list): 文字颜色 [R, G, B] 或 [R, G, B, A]
+            stroke_color (list): 描边颜色；缺省时与文字颜色相同
+        """
+        if not name or not isinstance(name, str):
+            raise ValueError("配置无效: color_variants 中每个变体都必须有 name")
+        self.name = name
+        self.color = _color_tuple(color, f"color_variants.{name}.color")
+        self.stroke_color = self.color if stroke_color is None else _color_tuple(
+            stroke_color, f"color_variants.{name}.stroke_color")
+
+    def signature(self):
+        """返回变体配置的签名元组（用于判断配置是否变化）"""
+        return (self.name, self.color, self.stroke_color)
+
+    def relative_path(self, output_filename):
+        """
+        颜色变体文件相对于输出目录的路径：<变体名>/<原相对路径>（尺寸变体同样位于变体名目录下）。
+
+        Args:
+            output_filename (str): 默认颜色下的相对路径
+
+        Returns:
+            str: 颜色变体的相对路径
+        """
+        return f"{self.name}/{output_filename}"
+
+
+def parse_color_variants(config, output_variants=()):
+    """
+    解析并校验配置中的 color_variants 列表。
+
+    Args:
+        config (dict): 配置信息
+        output_variants (tuple[OutputVariant, ...]): 尺寸变体（名称不能与颜色变体相同，两者都作为子目录名）
+
+    Returns:
+        tuple[ColorVariant, ...]: 颜色变体列表（未配置时为空）
+    """
+    items = config.get('color_variants') or []
+    if not isinstance(items, list):
+        raise ValueError("配置无效: color_variants 必须为列表")
+    variants = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("配置无效: color_variants 的每一项必须为字典")
+        if 'color' not in item:
+            raise ValueError(f"配置无效: 颜色变体 {item.get('name')} 缺少字段 color")
+        variants.append(ColorVariant(item.get('name'), item['color'], item.get('stroke_color')))
+    names = [v.name for v in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("配置无效: color_variants 的 name 不能重复")
+    clashes = set(names) & {v.name for v in output_variants}
+    if clashes:
+        raise ValueError(f"配置无效: color_variants 与 output_variants 的 name 不能相同: {', '.join(sorted(clashes))}")
+    return tuple(variants)
+
+
+class VariantRenderer:
+    """
+    变体派生器：缓存每个变体的预缩放背景，并从全尺寸图片派生变体。
+    """
+
+    def __init__(self, variants):
+        """
+        Args:
+            variants (tuple[OutputVariant, ...]): 变体列表
+        """
+        self.variants = variants
+        self._backgrounds = {}
+        self._source = None
+
+    def reset(self):
+        """清空预缩放背景缓存（背景图片变化后调用）"""
+        self._backgrounds.clear()
+        self._source = None
+
+    def scaled_background(self, variant, background):
+        """
+        获取变体的预缩放背景（同一背景对象只缩放一次）。
+
+        Args:
+            variant (OutputVariant): 变体
+            background (Image.Image): 全尺寸背景
+
+        Returns:
+            Image.Image: 缩放后的背景
+        """
+        if self._source is not background:
+            self.reset()
+            self._source = background
+        scaled = self._backgrounds.get(variant.name)
+        if scaled is None:
+            size = variant.target_size(background.size)
+            if size == background.size:
+                scaled = background
+            else:
+                scaled = background.resize(size, RESAMPLE_FILTERS[variant.resample][0])
+            self._backgrounds[variant.name] = scaled
+        return scaled
+
+    def derive_region(self, variant, image, dirty_box):
+        """
+        计算变体中与预缩放背景不同的区域。
+
+        将 dirty_box（文字绘制影响的区域）按滤波器支撑范围向外扩展后映射到变体坐标，
+        仅对该区域做缩放（使用 resize 的 box 参数，采样位置与整图缩放完全相同）。
+
+        Args:
+            variant (OutputVariant): 变体
+            image (Image.Image): 全尺寸图片
+            dirty_box (tuple[int, int, int, int]): 全尺寸坐标下的变化区域 (x0, y0, x1, y1)
+
+        Returns:
+            tuple[Image.Image, tuple[int, int]] | None: (变体坐标下的图块, 贴回位置)；与背景相同时返回 None
+        """
+        width, height = image.size
+        target_w, target_h = variant.target_size(image.size)
+        x0, y0, x1, y1 = dirty_box
+        if (target_w, target_h) == (width, height):
+            box = (max(0, x0), max(0, y0), min(width, x1), min(height, y1))
+            if box[2] <= box[0] or box[3] <= box[1]:
+                return None
+            return image.crop(box), box[:2]
+
+        resample, support = RESAMPLE_FILTERS[variant.resample]
+        if variant.resample in ('nearest', 'box'):
+            return image.resize((target_w, target_h), resample), (0, 0)
+
+        sx = target_w / width
+        sy = target_h / height
+        # 缩小时滤波器在源图上的支撑范围按比例放大；额外 1px 作为取整余量
+        margin_x = support * max(1.0, 1.0 / sx) + 1
+        margin_y = support * max(1.0, 1.0 / sy) + 1
+
+        dx0 = max(0, math.floor((x0 - margin_x) * sx))
+        dy0 = max(0, math.floor((y0 - margin_y) * sy))
+        dx1 = min(target_w, math.ceil((x1 + margin_x) * sx))
+        dy1 = min(target_h, math.ceil((y1 + margin_y) * sy))
+        if dx1 <= dx0 or dy1 <= dy0:
+            return None
+
+        patch = image.resize(
+            (dx1 - dx0, dy1 - dy0),
+            resample,
+            box=(dx0 / sx, dy0 / sy, dx1 / sx, dy1 / sy)
+        )
+        return patch, (dx0, dy0)
+
+    def derive(self, variant, image, background, dirty_box):
+        """
+        从全尺寸图片派生一个变体：只缩放变化区域（见 derive_region），再贴到预缩放背景的副本上。
+
+        Args:
+            variant (OutputVariant): 变体
+            image (Image.Image): 全尺寸图片
+            background (Image.Image): 全尺寸背景（与 image 同尺寸）
+            dirty_box (tuple[int, int, int, int]): 全尺寸坐标下的变化区域 (x0, y0, x1, y1)
+
+        Returns:
+            Image.Image: 变体图片
+        """
+        target_size = variant.target_size(image.size)
+        if target_size == image.size:
+            return image
+        if variant.resample in ('nearest', 'box'):
+            return image.resize(target_size, RESAMPLE_FILTERS[variant.resample][0])
+
+        result = self.scaled_background(variant, background).copy()
+        region = self.derive_region(variant, image, dirty_box)
+        if region is not None:
+            result.paste(*region)
+        return result
@@ -0,0 +1,241 @@
+"""
+预览模块
+正式生成整批图片之前，从 Excel 中抽取有代表性的若干行：最长的 ID、落到最小字号的 ID、非英文 ID，其余随机抽取。
+按比例缩小模板、方框、字号范围与描边宽度后，用与正式生成相同的字号求解与排版逻辑绘制，拼成一张联系表，
+一两秒内即可检查新模板或新配置的效果。
+抽样只用字宽表向量化预测的字号排序，真实测量只用于候选与抽中的少数几行，行数很多时也不会拖慢预览。
+"""
+
+import logging
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+from layout_solver import BatchFontSizer
+from style_profiles import PROFILE_NON_LATIN
+
+logger = logging.getLogger(__name__)
+
+# 默认预览设置
+DEFAULT_PREVIEW = {
+    'count': 24,      # 抽取的行数
+    'scale': 0.25,    # 缩小比例
+    'columns': 4,     # 联系表每行的图片数
+    'seed': None,     # 随机抽样的种子；null 时每次不同
+}
+
+# 联系表中每张图片下方标签的高度与图片间距（像素）
+LABEL_HEIGHT = 16
+CELL_GAP = 8
+
+# 最小字号分组的候选数量为配额的几倍（按预测字号从小到大取，只对候选做真实测量）
+SHORTLIST_FACTOR = 4
+
+# 按比例缩放的字体设置字段
+_SCALED_FONT_KEYS = ('max_font_size', 'min_font_size', 'stroke_width')
+
+
+def parse_preview(config):
+    """
+    解析并校验配置中的 preview 字段（缺省项使用 DEFAULT_PREVIEW）。
+
+    Args:
+        config (dict): 配置信息
+
+    Returns:
+        dict: 合并后的预览设置
+    """
+    settings = config.get('preview') or {}
+    if not isinstance(settings, dict):
+        raise ValueError("配置无效: preview 必须为字典")
+    merged = dict(DEFAULT_PREVIEW)
+    merged.update(settings)
+    for key in ('count', 'columns'):
+        value = merged[key]
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise ValueError(f"配置无效: preview.{key} 必须为正整数")
+    scale = merged['scale']
+    if not isinstance(scale, (int, float)) or not 0 < scale <= 1:
+        raise ValueError(f"配置无效: preview.scale 必须在 (0, 1] 范围内，当前为 {scale}")
+    return merged
+
+
+def scaled_overrides(config, scale):
+    """
+    生成缩小模板所需的配置覆盖项：方框位置与尺寸、内边距、字号范围与描边宽度按比例缩放。
+
+    Args:
+        config (dict): 配置信息
+        scale (float): 缩小比例
+
+    Returns:
+        dict: 可传给 IDFillGenerator(overrides=...) 的覆盖项
+    """
+    text_box = config['text_box']
+    overrides = {
+        'text_box': {key: max(1, int(round(text_box[key] * scale))) if key in ('width', 'height')
+                     else int(round(text_box[key] * scale)) for key in ('x', 'y', 'width', 'height')},
+        'padding': int(round(config.get('padding', 0) * scale)),
+        # 预览只在内存中绘制完整图片
+        'output_mode': 'full',
+        'output_variants': [],
+        'workers': 1,
+    }
+    for section in ('font_settings', 'font_settings_latin', 'font_settings_non_latin'):
+        settings = config.get(section)
+        if not settings:
+            continue
+        scaled = {}
+        for key in _SCALED_FONT_KEYS:
+            if key in settings and settings[key]:
+                # 原本非零的值缩小后至少保留 1
+                scaled[key] = max(1, int(round(settings[key] * scale)))
+        if scaled:
+            overrides[section] = scaled
+    return overrides
+
+
+def predict_sizes(generator, rows):
+    """
+    用字宽表向量化预测每行的单行字号（不做真实测量，只作为抽样的排序依据）。
+
+    Args:
+        generator (IDFillGenerator): 生成器
+        rows (list[tuple[int, str, int]]): 渲染行 (编号, 用户ID, 样式档案索引)
+
+    Returns:
+        dict[int, int]: 行编号 -> 预测字号；无法预测的档案不包含在内
+    """
+    groups = {}
+    for i, user_id, profile_index in rows:
+        groups.setdefault(profile_index, []).append((i, user_id))
+    predicted = {}
+    for profile_index, items in groups.items():
+        profile = generator.profiles[profile_index]
+        try:
+            # font_size_solver 为 scan 时生成器不提供求解器，单独创建一个只用于预测
+            sizer = generator.font_sizer(profile) or BatchFontSizer(profile)
+            sizes = sizer.predict([user_id or ' ' for _, user_id in items])
+        except Exception as e:
+            logger.warning(f"预览字号预测失败，按长度选择最小字号候选: {e}")
+            continue
+        predicted.update((i, int(size)) for (i, _), size in zip(items, sizes))
+    return predicted
+
+
+def sample_rows(rows, size_of, profiles, count, seed=None, predicted=None):
+    """
+    分层抽取预览行：最长的 ID、落到最小字号的 ID、非英文 ID 各占约四分之一，其余随机抽取。
+
+    最小字号分组只检查预测字号最小的 SHORTLIST_FACTOR 倍配额的候选行，真实字号按需求解。
+
+    Args:
+        rows (list[tuple[int, str, int]]): 渲染行 (编号, 用户ID, 样式档案索引)
+        size_of (callable): 渲染行 -> 全尺寸下的单行字号（只对候选与抽中的行调用）
+        profiles (tuple[StyleProfile, ...]): 样式档案
+        count (int): 抽取的行数
+        seed (int): 随机种子
+        predicted (dict[int, int]): 可选，行编号 -> 预测字号（predict_sizes 的结果）；缺省时按长度选择候选
+
+    Returns:
+        list[tuple[tuple[int, str, int], str]]: (渲染行, 抽取原因) 列表，原因为 longest / min-size / non-latin / random
+    """
+    rng = random.Random(seed)
+    quota = max(1, count // 4)
+    picked = []
+    seen = set()
+
+    def take(candidates, reason, limit):
+        taken = 0
+        for row in candidates:
+            if taken >= limit or len(picked) >= count:
+                break
+            if row[0] not in seen:
+                seen.add(row[0])
+                picked.append((row, reason))
+                taken += 1
+
+    by_length = sorted(rows, key=lambda row: (-len(row[1]), row[0]))
+    take(by_length, 'longest', quota)
+    if predicted:
+        # 预测字号距本档案最小字号越近越靠前；同样接近时较长的优先
+        by_size = sorted(rows, key=lambda row: (predicted.get(row[0], float('inf')) - profiles[row[2]].min_font_size,
+                                                -len(row[1]), row[0]))
+    else:
+        by_size = by_length
+    shortlist = by_size[:quota * SHORTLIST_FACTOR]
+    take((row for row in shortlist if size_of(row) == profiles[row[2]].min_font_size), 'min-size', quota)
+    non_latin = [row for row in rows if row[2] == PROFILE_NON_LATIN]
+    rng.shuffle(non_latin)
+    take(non_latin, 'non-latin', quota)
+    rest = [row for row in rows if row[0] not in seen]
+    rng.shuffle(rest)
+    take(rest, 'random', count)
+    return picked
+
+
+def render_preview(generator, output_path='preview.png', settings=None):
+    """
+    抽取预览行并按比例缩小绘制成联系表。
+
+    Args:
+        generator (IDFillGenerator): 全尺寸生成器（提供配置、样式档案与 ID 列表）
+        output_path (str): 联系表输出路径
+        settings (dict): 可选，预览设置；缺省时使用生成器配置中的 preview 设置
+
+    Returns:
+        int: 联系表中的图片数量
+    """
+    from id_fill_generator import IDFillGenerator, merge_config  # 函数级导入，避免循环依赖
+
+    settings = settings or generator.preview
+    scale = settings['scale']
+
+    rows = generator.build_render_rows(generator.read_excel_data())
+    sizes = {}
+
+    def size_of(row):
+        # 只对候选与抽中的行按需求解，与正式生成使用相同的求解方式（predict 或 scan）
+        i, user_id, profile_index = row
+        if i not in sizes:
+            sizes[i] = generator._fit_font(user_id, generator.profiles[profile_index]).size
+        return sizes[i]
+
+    picked = sample_rows(rows, size_of, generator.profiles, settings['count'], settings['seed'],
+                         predicted=predict_sizes(generator, rows))
+    if not picked:
+        logger.warning("没有可预览的 ID")
+        return 0
+
+    # 缩小后的生成器：同一套字号求解与排版逻辑，作用在按比例缩小的方框与字号范围上
+    overrides = merge_config(generator.overrides or {}, scaled_overrides(generator.config, scale))
+    small = IDFillGenerator(generator.config_path, overrides=overrides, resources=generator.resources)
+    background = generator.load_background()
+    small._background = background.resize(
+        (max(1, int(round(background.width * scale))), max(1, int(round(background.height * scale)))),
+        Image.Resampling.LANCZOS)
+    small_sizes = small.solve_font_sizes([row for row, _ in picked])
+
+    cell_w, cell_h = small._background.size
+    columns = min(settings['columns'], len(picked))
+    lines = -(-len(picked) // columns)
+    sheet = Image.new('RGB', (columns * (cell_w + CELL_GAP) + CELL_GAP,
+                              lines * (cell_h + LABEL_HEIGHT + CELL_GAP) + CELL_GAP), 'white')
+    draw = ImageDraw.Draw(sheet)
+    label_font = ImageFont.load_default()
+    for n, (row, reason) in enumerate(picked):
+        i, user_id, profile_index = row
+        x = CELL_GAP + (n % columns) * (cell_w + CELL_GAP)
+        y = CELL_GAP + (n // columns) * (cell_h + LABEL_HEIGHT + CELL_GAP)
+        image = small.render_id_image(user_id, profile_index=profile_index, font_size=small_sizes.get(i))
+        sheet.paste(image.convert('RGB'), (x, y))
+        label = f"#{i} {reason} {size_of(row)}px"
+        draw.text((x, y + cell_h + 2), label, fill='black', font=label_font)
+
+    sheet.save(output_path)
+    counts = {}
+    for _, reason in picked:
+        counts[reason] = counts.get(reason, 0) + 1
+    logger.info(f"预览联系表已保存: {output_path}（{len(picked)} 张，缩小比例 {scale}，"
+                + "，".join(f"{reason} {n}" for reason, n in counts.items()) + "）")
+    return len(picked)
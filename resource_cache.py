@@ -0,0 +1,44 @@
+"""
+共享资源缓存
+在同一进程内运行多个任务时，字体句柄与背景模板只加载一次并在任务之间复用。
+"""
+
+import os
+
+from PIL import Image
+
+
+class ResourceCache:
+    """字体与背景模板的进程内缓存"""
+
+    def __init__(self):
+        # 字体路径 -> {字号: 字体}；直接作为 compile_style_profiles 的 font_cache 使用
+        self.fonts = {}
+        # 背景路径 -> (文件修改标记, RGBA 图片)
+        self.backgrounds = {}
+        self.background_loads = 0
+
+    def background(self, path):
+        """
+        获取背景图片（RGBA）；文件在磁盘上被修改后自动重新加载。
+
+        Args:
+            path (str): 背景图片路径
+
+        Returns:
+            Image.Image: 背景图片（调用方不得原地修改，绘制前应先 copy）
+        """
+        key = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self.backgrounds.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        image = Image.open(path).convert('RGBA')
+        self.backgrounds[key] = (stamp, image)
+        self.background_loads += 1
+        return image
+
+    def font_count(self):
+        """返回当前已加载的字体句柄数量（全部字体文件与字号之和）"""
+        return sum(len(sizes) for sizes in self.fonts.values())
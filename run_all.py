@@ -77,19 +77,22 @@ def resolve_program_paths(base_dir: str) -> dict:
     }
 
 
-def run_find_text_box(paths: dict) -> int:
+def run_find_text_box(paths: dict, auto: bool = False) -> int:
     """运行方框定位工具
     - 若存在 .exe 则运行 .exe
     - 否则使用当前 Python 解释器运行 .py
+    - auto=True 时追加 --auto 参数：不打开界面，自动检测方框并写入配置
     返回进程退出码
     """
+    extra = ['--auto'] if auto else []
+    mode = "自动检测文字方框" if auto else "进行文字方框设置"
     if os.path.exists(paths['find_exe']):
-        print("[INFO] 启动 FindTextBox.exe 进行文字方框设置...")
-        result = subprocess.run([paths['find_exe']], cwd=os.path.dirname(paths['find_exe']))
+        print(f"[INFO] 启动 FindTextBox.exe {mode}...")
+        result = subprocess.run([paths['find_exe']] + extra, cwd=os.path.dirname(paths['find_exe']))
         return result.returncode
     elif os.path.exists(paths['find_py']):
-        print("[INFO] 未找到 FindTextBox.exe，回退运行 find_text_box.py...")
-        result = subprocess.run([sys.executable, paths['find_py']], cwd=os.path.dirname(paths['find_py']))
+        print(f"[INFO] 未找到 FindTextBox.exe，回退运行 find_text_box.py {mode}...")
+        result = subprocess.run([sys.executable, paths['find_py']] + extra, cwd=os.path.dirname(paths['find_py']))
         return result.returncode
     else:
         print("[ERROR] 未找到方框定位工具（FindTextBox.exe 或 find_text_box.py）")
@@ -118,7 +121,7 @@ def run_batch_fill(paths: dict) -> int:
 def main():
     """总控流程
     1) 加载配置并校验文字方框
-    2) 若方框无效：运行 FindTextBox，等待用户设置后再次校验
+    2) 若方框无效：先以 --auto 自动检测方框；检测失败时再打开 FindTextBox 界面，等待用户设置后再次校验
     3) 方框有效：运行 BatchIdFill 生成图片
     """
     base_dir = get_base_dir()
@@ -133,14 +136,20 @@ def main():
     valid, reason = is_text_box_valid(cfg)
     if not valid:
         print(f"[WARN] 文字方框配置无效：{reason}")
-        rc = run_find_text_box(paths)
-        if rc != 0:
-            print(f"[ERROR] 方框定位工具运行失败，退出码: {rc}")
-            sys.exit(rc)
-
-        # 再次读取配置并校验
-        cfg = load_config(config_path)
-        valid, reason = is_text_box_valid(cfg)
+        rc = run_find_text_box(paths, auto=True)
+        if rc == 0:
+            cfg = load_config(config_path)
+            valid, reason = is_text_box_valid(cfg)
+        if not valid:
+            print("[WARN] 未能自动检测文字方框，打开方框定位工具手动设置")
+            rc = run_find_text_box(paths)
+            if rc != 0:
+                print(f"[ERROR] 方框定位工具运行失败，退出码: {rc}")
+                sys.exit(rc)
+
+            # 再次读取配置并校验
+            cfg = load_config(config_path)
+            valid, reason = is_text_box_valid(cfg)
         if not valid:
             print(f"[ERROR] 方框仍未正确配置：{reason}。请重新运行并在 FindTextBox 中保存配置。")
             sys.exit(2)
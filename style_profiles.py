@@ -0,0 +1,291 @@
+"""
+样式配置编译模块
+在启动时一次性校验 config.json，并将字体相关设置编译为不可变的样式档案（StyleProfile）。
+每一行 ID 只需引用档案索引即可完成绘制，避免逐行合并配置字典。
+"""
+
+from PIL import ImageFont
+
+from text_shaping import LAYOUT_ENGINES, shaping_for_text
+
+
+# 档案索引：英文（纯 ASCII）与非英文文本
+PROFILE_LATIN = 0
+PROFILE_NON_LATIN = 1
+
+# 对齐方式到 Pillow anchor 的映射
+ALIGNMENT_ANCHORS = {
+    'center': 'mm',
+    'left': 'lm',
+    'right': 'rm',
+}
+
+
+def is_ascii_text(text):
+    """
+    判断文本是否全部为 ASCII 字符（英文/非英文档案的划分依据；IDFillGenerator.is_ascii_text 直接调用本函数）。
+
+    Args:
+        text (str): 需要判断的文本
+
+    Returns:
+        bool: True 表示全部为 ASCII
+    """
+    try:
+        return str(text).isascii()
+    except Exception:
+        return all(ord(ch) < 128 for ch in str(text))
+
+
+def profile_index_for_text(text):
+    """
+    根据文本内容返回对应的样式档案索引。
+
+    Args:
+        text (str): 需要绘制的文本
+
+    Returns:
+        int: PROFILE_LATIN 或 PROFILE_NON_LATIN
+    """
+    return PROFILE_LATIN if is_ascii_text(text) else PROFILE_NON_LATIN
+
+
+class StyleProfile:
+    """
+    不可变的样式档案。
+
+    保存绘制一行文字所需的全部已解析参数：字体路径与字体句柄缓存、颜色元组、
+    描边宽度、字号范围、anchor 及其坐标、方框可用宽高、排版引擎选择方式。
+    字体句柄缓存（字号 -> 字体）可由多个档案共享，例如多任务批量运行时同一字体文件只加载一次。
+    档案可被 pickle，以便传递给工作进程（字体句柄缓存不会被序列化，进程内按需重建）。
+    """
+
+    __slots__ = (
+        'index', 'name', 'font_path', 'color', 'stroke_color', 'stroke_width',
+        'max_font_size', 'min_font_size', 'anchor', 'text_xy',
+        'available_width', 'available_height', 'layout_engine', '_fonts',
+    )
+
+    def __init__(self, index, name, font_path, color, stroke_color, stroke_width,
+                 max_font_size, min_font_size, anchor, text_xy,
+                 available_width, available_height, layout_engine='auto', fonts=None):
+        values = {
+            'index': index,
+            'name': name,
+            'font_path': font_path,
+            'color': color,
+            'stroke_color': stroke_color,
+            'stroke_width': stroke_width,
+            'max_font_size': max_font_size,
+            'min_font_size': min_font_size,
+            'anchor': anchor,
+            'text_xy': text_xy,
+            'available_width': available_width,
+            'available_height': available_height,
+            'layout_engine': layout_engine,
+            '_fonts': {} if fonts is None else fonts,
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"StyleProfile 为只读对象，不能修改属性: {key}")
+
+    def __reduce__(self):
+        return (StyleProfile, (
+            self.index, self.name, self.font_path, self.color, self.stroke_color,
+            self.stroke_width, self.max_font_size, self.min_font_size, self.anchor,
+            self.text_xy, self.available_width, self.available_height, self.layout_engine,
+        ))
+
+    def __repr__(self):
+        return (f"StyleProfile(index={self.index}, name={self.name!r}, font_path={self.font_path!r}, "
+                f"stroke_width={self.stroke_width}, anchor={self.anchor!r})")
+
+    def signature(self):
+        """
+        返回档案的内容签名（不含字体句柄缓存），用于判断两次编译结果是否等价。
+
+        Returns:
+            tuple: 档案全部参数组成的元组
+        """
+        return self.__reduce__()[1]
+
+    def clear_fonts(self):
+        """清空字体句柄缓存（字体文件被修改后调用）。"""
+        self._fonts.clear()
+
+    def shaping_for(self, text):
+        """
+        为文字选择排版引擎、书写方向与语言（按档案的 layout_engine 设置）。
+
+        Args:
+            text (str): 文字
+
+        Returns:
+            TextShaping: 排版方式
+        """
+        return shaping_for_text(text, self.layout_engine)
+
+    def get_font(self, size, engine=ImageFont.Layout.BASIC):
+        """
+        获取指定字号与排版引擎的字体句柄（同一进程内缓存，避免重复打开字体文件）。
+
+        Args:
+            size (int): 字号
+            engine (ImageFont.Layout): 排版引擎，默认 BASIC
+
+        Returns:
+            ImageFont.FreeTypeFont: 字体对象
+        """
+        key = size if engine == ImageFont.Layout.BASIC else (size, int(engine))
+        font = self._fonts.get(key)
+        if font is None:
+            font = ImageFont.truetype(self.font_path, size, layout_engine=engine)
+            self._fonts[key] = font
+        return font
+
+
+def _color_tuple(value, key):
+    """将配置中的颜色列表校验并转换为整数元组。"""
+    if not isinstance(value, (list, tuple)) or len(value) not in (3, 4):
+        raise ValueError(f"配置无效: {key} 必须为 [R, G, B] 或 [R, G, B, A]")
+    try:
+        return tuple(int(c) for c in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"配置无效: {key} 必须为整数颜色分量")
+
+
+def validate_config(config):
+    """
+    校验配置文件中的必需字段与取值范围。
+
+    Args:
+        config (dict): 配置信息
+
+    Raises:
+        ValueError: 配置缺失字段或取值非法
+    """
+    for key in ('font_path', 'background_image', 'excel_file', 'output_dir', 'text_box', 'font_settings'):
+        if key not in config:
+            raise ValueError(f"配置无效: 缺少字段 {key}")
+
+    text_box = config['text_box']
+    if not isinstance(text_box, dict):
+        raise ValueError("配置无效: text_box 必须为字典")
+    for key in ('x', 'y', 'width', 'height'):
+        if key not in text_box:
+            raise ValueError(f"配置无效: text_box 缺少字段 {key}")
+    if text_box['width'] <= 0 or text_box['height'] <= 0:
+        raise ValueError("配置无效: text_box 的 width/height 必须为正数")
+
+    alignment = config.get('text_alignment', 'center')
+    if alignment not in ALIGNMENT_ANCHORS:
+        raise ValueError(f"配置无效: text_alignment 必须为 center/left/right，当前为 {alignment}")
+
+    padding = config.get('padding', 0)
+    if padding < 0 or 2 * padding >= min(text_box['width'], text_box['height']):
+        raise ValueError(f"配置无效: padding={padding} 超出方框尺寸")
+
+    layout_engine = config.get('layout_engine', 'auto')
+    if layout_engine not in LAYOUT_ENGINES:
+        raise ValueError(f"配置无效: layout_engine 必须为 auto/basic/raqm，当前为 {layout_engine}")
+
+    for key in ('font_settings', 'font_settings_latin', 'font_settings_non_latin'):
+        if config.get(key) is not None and not isinstance(config[key], dict):
+            raise ValueError(f"配置无效: {key} 必须为字典")
+
+
+def merge_font_settings(config, is_ascii):
+    """
+    合并全局与英文/非英文字体设置，并规范化加粗/描边与描边颜色。
+
+    规则与 IDFillGenerator.get_font_settings_for_text 一致：
+    - bold=False 时强制 stroke_width=0
+    - bold=True 且 stroke_width 缺省或为 0 时，默认 stroke_width=1
+    - 未设置 stroke_color 时与 color 相同
+
+    Args:
+        config (dict): 配置信息
+        is_ascii (bool): 是否为英文（纯 ASCII）文本
+
+    Returns:
+        dict: 合并后的字体设置
+    """
+    base = dict(config.get('font_settings', {}))
+    overrides = config.get('font_settings_latin') if is_ascii else config.get('font_settings_non_latin')
+    if overrides:
+        base.update(overrides)
+
+    if not base.get('bold', False):
+        base['stroke_width'] = 0
+    else:
+        sw = int(base.get('stroke_width', 0) or 0)
+        base['stroke_width'] = sw if sw != 0 else 1
+
+    if base.get('stroke_color') is None:
+        base['stroke_color'] = base.get('color')
+
+    return base
+
+
+def _resolve_font_path(config, is_ascii):
+    """按文本类型选择字体路径，未配置专用字体时回退到 font_path。"""
+    key = 'font_path_latin' if is_ascii else 'font_path_non_latin'
+    return config.get(key) or config['font_path']
+
+
+def compile_style_profiles(config, font_cache=None):
+    """
+    校验配置并编译全部样式档案。
+
+    Args:
+        config (dict): 配置信息
+        font_cache (dict): 可选，字体路径 -> {字号: 字体} 的共享缓存；相同字体文件的档案共用同一份字体句柄
+
+    Returns:
+        tuple[StyleProfile, ...]: 按档案索引排列的样式档案
+    """
+    validate_config(config)
+
+    text_box = config['text_box']
+    padding = config.get('padding', 0)
+    alignment = config.get('text_alignment', 'center')
+    anchor = ALIGNMENT_ANCHORS[alignment]
+
+    center_y = text_box['y'] + text_box['height'] // 2
+    if alignment == 'center':
+        text_xy = (text_box['x'] + text_box['width'] // 2, center_y)
+    elif alignment == 'left':
+        text_xy = (text_box['x'] + padding, center_y)
+    else:
+        text_xy = (text_box['x'] + text_box['width'] - padding, center_y)
+
+    profiles = []
+    for index, name, is_ascii in ((PROFILE_LATIN, 'latin', True), (PROFILE_NON_LATIN, 'non_latin', False)):
+        settings = merge_font_settings(config, is_ascii)
+        for key in ('color', 'max_font_size', 'min_font_size'):
+            if key not in settings:
+                raise ValueError(f"配置无效: font_settings 缺少字段 {key}")
+        max_font_size = int(settings['max_font_size'])
+        min_font_size = int(settings['min_font_size'])
+        if min_font_size <= 0 or min_font_size > max_font_size:
+            raise ValueError(f"配置无效: {name} 的字号范围 [{min_font_size}, {max_font_size}] 非法")
+
+        profiles.append(StyleProfile(
+            index=index,
+            name=name,
+            font_path=_resolve_font_path(config, is_ascii),
+            color=_color_tuple(settings['color'], f"{name}.color"),
+            stroke_color=_color_tuple(settings['stroke_color'], f"{name}.stroke_color"),
+            stroke_width=int(settings['stroke_width']),
+            max_font_size=max_font_size,
+            min_font_size=min_font_size,
+            anchor=anchor,
+            text_xy=text_xy,
+            available_width=text_box['width'] - 2 * padding,
+            available_height=text_box['height'] - 2 * padding,
+            layout_engine=config.get('layout_engine', 'auto'),
+            fonts=None if font_cache is None else font_cache.setdefault(_resolve_font_path(config, is_ascii), {}),
+        ))
+    return tuple(profiles)
@@ -0,0 +1,107 @@
+"""
+字号求解一致性检查脚本
+随机生成一批英文 ID，分别在无描边与有描边两种设置下，比较批量求解器（BatchFontSizer.solve，
+font_size_solver=predict 的默认路径）与从最大字号逐级缩小的搜索（calculate_font_size）的结果，
+两者必须逐个相同；修改 measure_safe_size 或预测逻辑后运行，防止默认求解器悄悄偏离。
+
+用法：
+    python test_font_sizer.py [--config config.json] [--count 400] [--seed 0]
+"""
+
+import sys
+import random
+import string
+import logging
+import argparse
+
+from id_fill_generator import IDFillGenerator
+from layout_solver import BatchFontSizer
+from style_profiles import PROFILE_LATIN
+
+logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 检查的描边设置：(名称, font_settings_latin 覆盖项)
+STROKE_CASES = [
+    ('无描边', {'bold': False}),
+    ('描边 5', {'bold': True, 'stroke_width': 5}),
+]
+
+# 随机 ID 使用的字符（含容易出现字偶距的大小写组合与数字）
+ID_CHARS = string.ascii_letters + string.digits + '_-.'
+
+
+def random_ids(count, seed=0, max_length=40):
+    """
+    生成随机英文 ID（长度 1~max_length，覆盖最大字号到最小字号的整个范围）。
+
+    Args:
+        count (int): 数量
+        seed (int): 随机种子
+        max_length (int): 最大长度
+
+    Returns:
+        list[str]: ID 列表
+    """
+    rng = random.Random(seed)
+    return [''.join(rng.choice(ID_CHARS) for _ in range(rng.randint(1, max_length))) for _ in range(count)]
+
+
+def scan_size(generator, profile, text):
+    """按从最大字号逐级缩小的搜索求字号（与 _fit_font 的 scan 路径相同）"""
+    shaping = profile.shaping_for(text)
+    return generator.calculate_font_size(
+        text,
+        profile.font_path,
+        profile.available_width,
+        profile.available_height,
+        profile.max_font_size,
+        profile.min_font_size,
+        stroke_width=profile.stroke_width,
+        font_getter=lambda size: profile.get_font(size, shaping.engine),
+        direction=shaping.direction,
+        language=shaping.language
+    )
+
+
+def check(config_path, count, seed):
+    """
+    逐个比较两种求解方式的结果。
+
+    Args:
+        config_path (str): 配置文件路径
+        count (int): 随机 ID 数量
+        seed (int): 随机种子
+
+    Returns:
+        int: 不一致的数量
+    """
+    texts = random_ids(count, seed)
+    mismatches = 0
+    for name, overrides in STROKE_CASES:
+        generator = IDFillGenerator(config_path, overrides={'font_settings_latin': overrides})
+        profile = generator.profiles[PROFILE_LATIN]
+        solved = BatchFontSizer(profile).solve(texts)
+        bad = [(text, size, scan_size(generator, profile, text)) for text, size in zip(texts, solved)]
+        bad = [item for item in bad if item[1] != item[2]]
+        mismatches += len(bad)
+        print(f"{name}（描边宽度 {profile.stroke_width}）: {len(texts)} 个 ID，不一致 {len(bad)} 个")
+        for text, predicted, scanned in bad[:10]:
+            print(f"  {text!r}: 批量求解 {predicted}，逐级搜索 {scanned}")
+    return mismatches
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="字号求解一致性检查")
+    parser.add_argument('--config', default='config.json', help="配置文件路径（默认 config.json）")
+    parser.add_argument('--count', type=int, default=400, help="随机 ID 数量（默认 400）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子（默认 0）")
+    args = parser.parse_args()
+    mismatches = check(args.config, args.count, args.seed)
+    print("结果一致" if not mismatches else f"共 {mismatches} 个不一致")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+局部图块区域检查脚本
+在换行（多行）排版下生成一批长 ID 的局部图块（提高最小字号，确保长 ID 在单行放不下而换行，且换行后放得下），检查：
+- 图块区域与写入 patches.json 的 x/y/width/height 均为整数（客户端可直接 template.paste(patch, (x, y))）
+- 把图块贴回模板后与完整图片逐像素一致
+
+用法：
+    python test_patch_regions.py [--config config.json] [--count 40] [--seed 0]
+"""
+
+import os
+import sys
+import json
+import random
+import string
+import logging
+import argparse
+import tempfile
+
+from id_fill_generator import IDFillGenerator
+from output_layout import write_patch_manifest
+from style_profiles import PROFILE_LATIN
+
+logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 检查的排版设置：(名称, text_fit 覆盖项)
+FIT_CASES = [
+    ('wrap', {'mode': 'wrap', 'max_lines': 3}),
+    ('wrap_ellipsis', {'mode': 'wrap_ellipsis', 'max_lines': 2}),
+]
+
+# 检查的裁剪方式
+CROPS = ('box', 'tight')
+
+
+def long_ids(count, seed=0):
+    """
+    生成需要换行的长 ID（一半含空格，在空格处断行；一半不含空格，在任意字间断行）。
+
+    Args:
+        count (int): 数量
+        seed (int): 随机种子
+
+    Returns:
+        list[str]: ID 列表
+    """
+    rng = random.Random(seed)
+    chars = string.ascii_letters + string.digits
+    ids = []
+    for n in range(count):
+        words = [''.join(rng.choice(chars) for _ in range(rng.randint(3, 12))) for _ in range(rng.randint(4, 10))]
+        ids.append(' '.join(words) if n % 2 else ''.join(words))
+    return ids
+
+
+def wrap_overrides(config_path, text_fit):
+    """
+    生成检查用的覆盖项：换行设置，并把各字体设置的最小字号提高到方框高度能容纳 max_lines + 1 行的字号。
+
+    Args:
+        config_path (str): 配置文件路径
+        text_fit (dict): text_fit 覆盖项
+
+    Returns:
+        dict: 覆盖项
+    """
+    profile = IDFillGenerator(config_path).profiles[PROFILE_LATIN]
+    min_size = min(max(profile.min_font_size, profile.available_height // (text_fit['max_lines'] + 1)),
+                   profile.max_font_size)
+    overrides = {'text_fit': text_fit}
+    for section in ('font_settings', 'font_settings_latin', 'font_settings_non_latin'):
+        overrides[section] = {'min_font_size': min_size}
+    return overrides
+
+
+def check(config_path, count, seed):
+    """
+    逐个检查图块区域的类型以及贴回后的结果。
+
+    Args:
+        config_path (str): 配置文件路径
+        count (int): ID 数量
+        seed (int): 随机种子
+
+    Returns:
+        int: 出错的数量
+    """
+    texts = long_ids(count, seed)
+    errors = 0
+    for name, text_fit in FIT_CASES:
+        generator = IDFillGenerator(config_path, overrides=wrap_overrides(config_path, text_fit))
+        background = generator.load_background()
+        profile = generator.profiles[PROFILE_LATIN]
+        wrapped = sum('\n' in generator._layout_text(text, profile, None)[0] for text in texts)
+        if not wrapped:
+            errors += 1
+            print(f"{name}: 没有换行的 ID，无法检查多行排版")
+        for crop in CROPS:
+            bad = []
+            placements = []
+            for n, text in enumerate(texts, 1):
+                patch, region = generator.render_id_patch(text, crop=crop)
+                placements.append((n, text, f"{n}.png", region))
+                if not all(isinstance(v, int) for v in region):
+                    bad.append((text, f"区域不是整数: {region}"))
+                    continue
+                restored = background.copy()
+                restored.paste(patch, region[:2])
+                if restored.tobytes() != generator.render_id_image(text).tobytes():
+                    bad.append((text, f"贴回后与完整图片不一致: {region}"))
+
+            # 清单经 JSON 往返后仍为整数
+            with tempfile.TemporaryDirectory() as tmp:
+                manifest_path = os.path.join(tmp, 'patches.json')
+                write_patch_manifest(manifest_path, generator.background_path, background.size,
+                                     generator.config['text_box'], placements)
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    patches = json.load(f)['patches']
+            for item in patches:
+                if not all(isinstance(item[key], int) for key in ('x', 'y', 'width', 'height')):
+                    bad.append((item['id'], f"清单中的位置不是整数: {item}"))
+
+            errors += len(bad)
+            print(f"{name} / {crop}: {len(texts)} 个 ID（换行 {wrapped} 个），出错 {len(bad)} 个")
+            for text, reason in bad[:10]:
+                print(f"  {text!r}: {reason}")
+    return errors
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="局部图块区域检查")
+    parser.add_argument('--config', default='config.json', help="配置文件路径（默认 config.json）")
+    parser.add_argument('--count', type=int, default=40, help="长 ID 数量（默认 40）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子（默认 0）")
+    args = parser.parse_args()
+    errors = check(args.config, args.count, args.seed)
+    print("检查通过" if not errors else f"共 {errors} 个错误")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
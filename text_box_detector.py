@@ -0,0 +1,206 @@
+"""
+文字方框自动检测
+在背景图片中寻找可放置文字的矩形区域（纯色填充的面板、边框围出的方框等），无需图形界面。
+
+算法（全部基于 NumPy 向量化运算）：
+1. 将图片缩小到约 512px 并量化颜色；
+2. 提取每一行的同色水平游程，把足够宽的 (起点, 终点, 颜色) 作为候选跨度；
+3. 对每个候选跨度，找出整段跨度都为该颜色的连续行，得到候选矩形；
+4. 按面积与“封闭度”（矩形外一圈像素与内部颜色不同的比例）打分，去除重叠候选；
+5. 在原图分辨率下逐边微调，得到精确坐标。
+"""
+
+import math
+
+import numpy as np
+from PIL import Image
+
+
+# 分析时图片长边的目标尺寸
+ANALYSIS_SIZE = 512
+
+# 候选跨度的最小宽度 / 候选矩形的最小高度（相对于图片宽高）
+MIN_WIDTH_RATIO = 0.05
+MIN_HEIGHT_RATIO = 0.02
+
+# 封闭度低于该值的候选（例如整块画布背景）被丢弃
+MIN_ENCLOSURE = 0.6
+
+# 原图微调时允许的单通道颜色误差
+COLOR_TOLERANCE = 8
+
+
+def _quantize(rgb):
+    """将 RGB 数组量化为 15 位颜色编码（每通道 5 位），用于判断“同色”"""
+    rgb = rgb.astype(np.int32) >> 3
+    return (rgb[..., 0] << 10) | (rgb[..., 1] << 5) | rgb[..., 2]
+
+
+def _row_runs(codes):
+    """
+    向量化提取每一行的同色游程。
+
+    Args:
+        codes (np.ndarray): 量化后的颜色编码，形状 (H, W)
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: (行号, 起点, 终点(不含), 颜色)
+    """
+    height, width = codes.shape
+    starts = np.ones((height, width), dtype=bool)
+    starts[:, 1:] = codes[:, 1:] != codes[:, :-1]
+    rows, xs = np.nonzero(starts)
+    ends = np.empty_like(xs)
+    ends[:-1] = xs[1:]
+    ends[-1] = width
+    # 每行最后一个游程的终点为行宽
+    row_last = np.ones(len(rows), dtype=bool)
+    row_last[:-1] = rows[1:] != rows[:-1]
+    ends[row_last] = width
+    return rows, xs, ends, codes[rows, xs]
+
+
+def _enclosure(codes, x0, y0, x1, y1, color):
+    """
+    计算矩形的封闭度：矩形外一圈像素中与内部颜色不同的比例（超出图片边界的部分视为不封闭）。
+    """
+    height, width = codes.shape
+    ring_total = 2 * (x1 - x0) + 2 * (y1 - y0)
+    different = 0
+    if y0 > 0:
+        different += int(np.count_nonzero(codes[y0 - 1, x0:x1] != color))
+    if y1 < height:
+        different += int(np.count_nonzero(codes[y1, x0:x1] != color))
+    if x0 > 0:
+        different += int(np.count_nonzero(codes[y0:y1, x0 - 1] != color))
+    if x1 < width:
+        different += int(np.count_nonzero(codes[y0:y1, x1] != color))
+    return different / ring_total if ring_total else 0.0
+
+
+def _iou(a, b):
+    """两个矩形 (x0, y0, x1, y1) 的交并比"""
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+
+def _refine(pixels, rect, color, tolerance=COLOR_TOLERANCE):
+    """
+    在原图分辨率下逐边微调矩形：边缘整行/整列与填充色一致则向外扩展，否则向内收缩。
+
+    Args:
+        pixels (np.ndarray): 原图 RGB 数组 (H, W, 3)，int16
+        rect (tuple[int, int, int, int]): 原图坐标下的初始矩形 (x0, y0, x1, y1)
+        color (np.ndarray): 填充色 (3,)
+        tolerance (int): 单通道颜色误差
+
+    Returns:
+        tuple[int, int, int, int] | None: 微调后的矩形；收缩为空时返回 None
+    """
+    height, width = pixels.shape[:2]
+    x0, y0, x1, y1 = rect
+
+    def uniform(region):
+        return region.size > 0 and bool((np.abs(region - color) <= tolerance).all())
+
+    # 先收缩：去掉缩放时混入的抗锯齿边缘
+    while y0 < y1 and not uniform(pixels[y0, x0:x1]):
+        y0 += 1
+    while y1 > y0 and not uniform(pixels[y1 - 1, x0:x1]):
+        y1 -= 1
+    while x0 < x1 and not uniform(pixels[y0:y1, x0]):
+        x0 += 1
+    while x1 > x0 and not uniform(pixels[y0:y1, x1 - 1]):
+        x1 -= 1
+    if x1 <= x0 or y1 <= y0:
+        return None
+
+    # 再扩展：补回缩放取整丢失的像素
+    while y0 > 0 and uniform(pixels[y0 - 1, x0:x1]):
+        y0 -= 1
+    while y1 < height and uniform(pixels[y1, x0:x1]):
+        y1 += 1
+    while x0 > 0 and uniform(pixels[y0:y1, x0 - 1]):
+        x0 -= 1
+    while x1 < width and uniform(pixels[y0:y1, x1]):
+        x1 += 1
+    return x0, y0, x1, y1
+
+
+def detect_text_boxes(image, max_candidates=5):
+    """
+    检测背景图片中的候选文字方框，按得分从高到低返回。
+
+    Args:
+        image (Image.Image | str): 背景图片或其路径
+        max_candidates (int): 最多返回的候选数量
+
+    Returns:
+        list[dict]: 候选列表，每项包含 x/y/width/height（原图坐标）与 score（封闭度，0~1）
+    """
+    if isinstance(image, str):
+        image = Image.open(image)
+    rgb = image.convert('RGB')
+    factor = max(1, math.ceil(max(rgb.size) / ANALYSIS_SIZE))
+    small = rgb.reduce(factor) if factor > 1 else rgb
+    codes = _quantize(np.asarray(small))
+    height, width = codes.shape
+
+    rows, starts, ends, colors = _row_runs(codes)
+    wide = (ends - starts) >= max(2, int(width * MIN_WIDTH_RATIO))
+    if not wide.any():
+        return []
+    spans, counts = np.unique(np.stack([starts[wide], ends[wide], colors[wide]], axis=1), axis=0, return_counts=True)
+    # 出现行数多、宽度大的跨度优先，限制候选数量以保证耗时可控
+    order = np.argsort(-(spans[:, 1] - spans[:, 0]) * counts)[:200]
+
+    min_height = max(2, int(height * MIN_HEIGHT_RATIO))
+    rects = set()
+    for x0, x1, color in spans[order]:
+        full = (codes[:, x0:x1] == color).all(axis=1)
+        padded = np.concatenate(([False], full, [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        for y0, y1 in zip(edges[::2], edges[1::2]):
+            if y1 - y0 >= min_height:
+                rects.add((int(x0), int(y0), int(x1), int(y1), int(color)))
+
+    scored = []
+    for x0, y0, x1, y1, color in rects:
+        enclosure = _enclosure(codes, x0, y0, x1, y1, color)
+        if enclosure < MIN_ENCLOSURE:
+            continue
+        area_ratio = (x1 - x0) * (y1 - y0) / (width * height)
+        scored.append((area_ratio * enclosure ** 2, enclosure, (x0, y0, x1, y1)))
+    scored.sort(reverse=True)
+
+    pixels = np.asarray(rgb).astype(np.int16)
+    candidates = []
+    kept = []
+    for score, enclosure, rect in scored:
+        if any(_iou(rect, other) > 0.5 for other in kept):
+            continue
+        kept.append(rect)
+        x0, y0, x1, y1 = (v * factor for v in rect)
+        x1 = min(x1, rgb.width)
+        y1 = min(y1, rgb.height)
+        # 以矩形中心区域的中位色作为填充色
+        cx0, cy0 = (3 * x0 + x1) // 4, (3 * y0 + y1) // 4
+        cx1, cy1 = (x0 + 3 * x1) // 4 + 1, (y0 + 3 * y1) // 4 + 1
+        color = np.median(pixels[cy0:cy1, cx0:cx1].reshape(-1, 3), axis=0)
+        refined = _refine(pixels, (x0, y0, x1, y1), color)
+        if refined is None:
+            continue
+        rx0, ry0, rx1, ry1 = refined
+        candidates.append({
+            'x': rx0,
+            'y': ry0,
+            'width': rx1 - rx0,
+            'height': ry1 - ry0,
+            'score': round(float(enclosure), 3),
+        })
+        if len(candidates) >= max_candidates:
+            break
+    return candidates
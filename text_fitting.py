@@ -0,0 +1,313 @@
+"""
+多行换行与省略号适配模块
+ID 在最小字号下仍放不进方框时，可换行为 2~N 行，或截断并加省略号；在所有候选排版中选择字号最大的一种。
+换行位置用动态规划求解：先按参考字号的单字宽度表算出前缀和，任意一段的宽度 O(1) 可得，
+在所有断点组合中找出“最宽一行最窄”的分法，只对最终候选做真实测量，长 ID 也不会拖慢单张图片。
+"""
+
+from collections import namedtuple
+
+from layout_solver import _MEASURE_DRAW, SAFETY_MARGIN, GlyphAdvanceTable, measure_safe_size
+from text_shaping import BASIC_SHAPING
+
+
+# 适配方式：none（不处理，文字超出方框，旧版行为）/ wrap（换行）/ ellipsis（省略号截断）/ wrap_ellipsis（先换行，仍放不下再截断）
+FIT_MODES = ('none', 'wrap', 'ellipsis', 'wrap_ellipsis')
+
+# 默认适配设置
+DEFAULT_TEXT_FIT = {
+    'mode': 'none',
+    'max_lines': 2,
+    'line_spacing': 0.1,
+    'ellipsis': '...',
+}
+
+# 排版结果：lines 为各行文字，font_size 为字号，fits 表示是否放得进方框
+FittedText = namedtuple('FittedText', ['lines', 'font_size', 'fits'])
+
+
+def parse_text_fit(config):
+    """
+    解析并校验配置中的 text_fit 字段（缺省项使用 DEFAULT_TEXT_FIT）。
+
+    Args:
+        config (dict): 配置信息
+
+    Returns:
+        dict: 合并后的适配设置
+    """
+    settings = config.get('text_fit') or {}
+    if not isinstance(settings, dict):
+        raise ValueError("配置无效: text_fit 必须为字典")
+    merged = dict(DEFAULT_TEXT_FIT)
+    merged.update(settings)
+    if merged['mode'] not in FIT_MODES:
+        raise ValueError(f"配置无效: text_fit.mode 必须为 {'/'.join(FIT_MODES)}，当前为 {merged['mode']}")
+    max_lines = merged['max_lines']
+    if not isinstance(max_lines, int) or isinstance(max_lines, bool) or max_lines < 1:
+        raise ValueError("配置无效: text_fit.max_lines 必须为正整数")
+    if not isinstance(merged['line_spacing'], (int, float)) or merged['line_spacing'] < 0:
+        raise ValueError("配置无效: text_fit.line_spacing 不能为负数")
+    if not isinstance(merged['ellipsis'], str):
+        raise ValueError("配置无效: text_fit.ellipsis 必须为字符串")
+    return merged
+
+
+def measure_safe_lines(lines, font, stroke_width=0, spacing=0, direction=None, language=None):
+    """
+    测量多行文字加上安全边距后的尺寸（单行时与 measure_safe_size 完全一致）。
+
+    Args:
+        lines (tuple[str, ...]): 各行文字
+        font (ImageFont.FreeTypeFont): 字体
+        stroke_width (int): 描边宽度
+        spacing (int): 行间距（像素）
+        direction (str): 书写方向（仅 RAQM 引擎）
+        language (str): 语言标签（仅 RAQM 引擎）
+
+    Returns:
+        tuple[float, float]: (安全宽度, 安全高度)
+    """
+    if len(lines) == 1:
+        return measure_safe_size(lines[0], font, stroke_width, direction, language)
+    bbox = _MEASURE_DRAW.multiline_textbbox((0, 0), '\n'.join(lines), font=font, spacing=spacing,
+                                            stroke_width=stroke_width, direction=direction, language=language)
+    ascent, descent = font.getmetrics()
+    actual_height = len(lines) * (ascent + descent) + (len(lines) - 1) * spacing
+    return (bbox[2] - bbox[0]) * SAFETY_MARGIN, max(bbox[3] - bbox[1], actual_height) * SAFETY_MARGIN
+
+
+class LineBreaker:
+    """
+    基于参考字号单字宽度表的换行求解器。
+
+    断点：文字包含空格时只在空格处断行（行首行尾的空格去掉）；否则任意两个字之间都可以断行。
+    """
+
+    def __init__(self, table):
+        """
+        Args:
+            table (GlyphAdvanceTable): 单字前进宽度与字偶距表
+        """
+        self.table = table
+
+    def _prefix_widths(self, text):
+        """前缀和：advances[j] 为前 j 个字的前进宽度之和，kerns[j] 为前 j 个相邻字对的字偶距之和"""
+        advances = [0.0]
+        kerns = [0.0]
+        for idx, ch in enumerate(text):
+            advances.append(advances[-1] + self.table.advance(ch))
+            if idx:
+                kerns.append(kerns[-1] + self.table.kern(text[idx - 1:idx + 1]))
+        return advances, kerns
+
+    @staticmethod
+    def break_points(text):
+        """可断行的位置（含 0 与 len(text)）"""
+        if ' ' in text.strip(' '):
+            inner = {i for i in range(1, len(text)) if text[i - 1] == ' ' and text[i] != ' '}
+            return [0] + sorted(inner) + [len(text)]
+        return list(range(len(text) + 1))
+
+    def partition(self, text, line_count):
+        """
+        将文字分成 line_count 行，使最宽一行的参考宽度最小（动态规划，O(行数 x 断点数²)）。
+
+        Args:
+            text (str): 文字
+            line_count (int): 行数
+
+        Returns:
+            tuple[tuple[str, ...], float] | None: (各行文字, 最宽一行的参考宽度)；断点不足时返回 None
+        """
+        points = self.break_points(text)
+        if len(points) - 1 < line_count:
+            return None
+        advances, kerns = self._prefix_widths(text)
+
+        def segment(i, j):
+            # 去掉行首行尾的空格后，[i, j) 的宽度 = 前进宽度之和 + 段内字偶距之和
+            while i < j and text[i] == ' ':
+                i += 1
+            while j > i and text[j - 1] == ' ':
+                j -= 1
+            if i >= j:
+                return float('inf')
+            return advances[j] - advances[i] + kerns[j - 1] - kerns[i]
+
+        count = len(points)
+        widths = [[segment(points[a], points[b]) if b > a else float('inf') for b in range(count)]
+                  for a in range(count)]
+        inf = float('inf')
+        # best[l][b]：前 points[b] 个字分成 l 行时最宽一行的最小宽度；choice 记录上一行的结束位置
+        best = [[inf] * count for _ in range(line_count + 1)]
+        choice = [[0] * count for _ in range(line_count + 1)]
+        best[0][0] = 0.0
+        for lines in range(1, line_count + 1):
+            for b in range(lines, count):
+                for a in range(lines - 1, b):
+                    value = max(best[lines - 1][a], widths[a][b])
+                    if value < best[lines][b]:
+                        best[lines][b] = value
+                        choice[lines][b] = a
+        if best[line_count][count - 1] == inf:
+            return None
+
+        result = []
+        b = count - 1
+        for lines in range(line_count, 0, -1):
+            a = choice[lines][b]
+            result.append(text[points[a]:points[b]].strip(' '))
+            b = a
+        return tuple(reversed(result)), best[line_count][count - 1]
+
+
+class TextFitter:
+    """
+    按样式档案为文字选择排版：单行、换行（2~max_lines 行）或省略号截断，取字号最大且放得进方框的一种。
+    """
+
+    def __init__(self, profile, settings):
+        """
+        Args:
+            profile (StyleProfile): 样式档案
+            settings (dict): parse_text_fit 返回的适配设置
+        """
+        self.profile = profile
+        self.mode = settings['mode']
+        self.max_lines = settings['max_lines']
+        self.line_spacing = settings['line_spacing']
+        self.ellipsis = settings['ellipsis']
+        self.table = GlyphAdvanceTable(profile.font_path)
+        self.breaker = LineBreaker(self.table)
+        self.checks = 0
+
+    def spacing(self, font_size):
+        """行间距（像素）"""
+        return int(round(font_size * self.line_spacing))
+
+    def fits(self, lines, size, shaping=BASIC_SHAPING):
+        """用真实测量判断多行文字在该字号下是否放得进方框（shaping 为整个 ID 实际绘制时的排版方式）"""
+        p = self.profile
+        self.checks += 1
+        width, height = measure_safe_lines(lines, p.get_font(size, shaping.engine), p.stroke_width,
+                                           self.spacing(size), shaping.direction, shaping.language)
+        return width <= p.available_width and height <= p.available_height
+
+    def predict(self, line_count, max_width):
+        """由最宽一行的参考宽度与行数预测字号"""
+        p = self.profile
+        ref = self.table.reference_size
+        by_width = (p.available_width / SAFETY_MARGIN - 2 * p.stroke_width) * ref / max(max_width, 1e-6)
+        per_line = self.table.line_height / ref
+        by_height = p.available_height / SAFETY_MARGIN / (line_count * per_line + (line_count - 1) * self.line_spacing)
+        return int(max(p.min_font_size, min(p.max_font_size, by_width, by_height)))
+
+    def solve_size(self, lines, predicted, shaping=BASIC_SHAPING):
+        """
+        从预测字号出发求最大可用字号（与 BatchFontSizer.confirm 相同的逐级确认方式）。
+
+        Returns:
+            tuple[int, bool]: (字号, 是否放得进方框)；最小字号仍放不下时返回 (min_font_size, False)
+        """
+        p = self.profile
+        size = predicted
+        if self.fits(lines, size, shaping):
+            while size < p.max_font_size and self.fits(lines, size + 1, shaping):
+                size += 1
+            return size, True
+        size -= 1
+        while size >= p.min_font_size:
+            if self.fits(lines, size, shaping):
+                return size, True
+            size -= 1
+        return p.min_font_size, False
+
+    def fit(self, text, single_size=None):
+        """
+        为文字选择排版。
+
+        Args:
+            text (str): 文字
+            single_size (int): 可选，已求解的单行字号（批量生成时预先求解）
+
+        Returns:
+            FittedText: 排版结果
+        """
+        p = self.profile
+        shaping = p.shaping_for(text)
+        if single_size is None:
+            width = self.table.reference_widths([text or ' '])[0]
+            single_size, single_fits = self.solve_size((text,), self.predict(1, width), shaping)
+        else:
+            single_fits = single_size > p.min_font_size or self.fits((text,), single_size, shaping)
+        best = FittedText((text,), single_size, single_fits)
+        if self.mode == 'none':
+            return best
+
+        # 只处理最小字号下单行仍放不下的 ID；单行放得下的 ID 保持原样，不会因换行能得到更大字号而重排
+        if not best.fits and self.mode in ('wrap', 'wrap_ellipsis'):
+            for line_count in range(2, self.max_lines + 1):
+                partition = self.breaker.partition(text, line_count)
+                if partition is None:
+                    break
+                lines, max_width = partition
+                size, ok = self.solve_size(lines, self.predict(line_count, max_width), shaping)
+                # 优先放得进方框，其次字号更大；字号相同时保留行数更少的排版
+                if (ok, size) > (best.fits, best.font_size):
+                    best = FittedText(lines, size, ok)
+
+        if not best.fits and self.mode in ('ellipsis', 'wrap_ellipsis'):
+            max_lines = self.max_lines if self.mode == 'wrap_ellipsis' else 1
+            best = self.truncate(text, max_lines, shaping)
+        return best
+
+    def _longest_prefix(self, text, font, shaping, suffix=''):
+        """二分查找在方框宽度内放得下的最长前缀长度（前缀去掉行尾空格后接 suffix）"""
+        p = self.profile
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            self.checks += 1
+            width = measure_safe_size(text[:mid].rstrip(' ') + suffix, font, p.stroke_width,
+                                      shaping.direction, shaping.language)[0]
+            if width <= p.available_width:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def truncate(self, text, max_lines, shaping=BASIC_SHAPING):
+        """
+        以最小字号截断文字：前几行尽量排满，最后一行截断并加省略号（行数以方框高度能容纳的为限）。
+
+        Args:
+            text (str): 文字
+            max_lines (int): 最多行数
+            shaping (TextShaping): 排版方式
+
+        Returns:
+            FittedText: 排版结果
+        """
+        p = self.profile
+        size = p.min_font_size
+        font = p.get_font(size, shaping.engine)
+        line_count = max_lines
+        while line_count > 1 and not self.fits(('',) * line_count, size, shaping):
+            line_count -= 1
+
+        lines = []
+        rest = text
+        for _ in range(line_count - 1):
+            cut = self._longest_prefix(rest, font, shaping)
+            if cut == 0 or cut >= len(rest):
+                break
+            lines.append(rest[:cut].rstrip(' '))
+            rest = rest[cut:].lstrip(' ')
+        cut = self._longest_prefix(rest, font, shaping, self.ellipsis)
+        if cut >= len(rest):
+            lines.append(rest)
+        else:
+            lines.append(rest[:cut].rstrip(' ') + self.ellipsis)
+        lines = tuple(lines)
+        return FittedText(lines, size, self.fits(lines, size, shaping))
@@ -0,0 +1,128 @@
+"""
+文字排版引擎选择模块
+Pillow 可用 BASIC 或 RAQM 引擎排版文字：RAQM 能正确整形阿拉伯文、泰文、天城文等复杂文字，
+但对纯 ASCII 等简单文字明显更慢。本模块按文字中出现的书写系统选择引擎：
+拉丁、中日韩等简单文字使用 BASIC；需要整形的文字使用 RAQM，并给出正确的书写方向与语言。
+"""
+
+import logging
+import re
+from collections import namedtuple
+
+from PIL import ImageFont, features
+
+logger = logging.getLogger(__name__)
+
+# 排版引擎选择方式：auto（按书写系统选择，默认）/ basic（全部使用 BASIC）/ raqm（全部使用 RAQM）
+LAYOUT_ENGINES = ('auto', 'basic', 'raqm')
+
+# 当前 Pillow 是否带有 RAQM（libraqm）支持
+RAQM_AVAILABLE = features.check('raqm')
+
+# 需要整形的书写系统：(起始码位, 结束码位, 语言标签, 是否从右到左)
+COMPLEX_SCRIPTS = (
+    (0x0590, 0x05FF, 'he', True),    # 希伯来文
+    (0x0600, 0x06FF, 'ar', True),    # 阿拉伯文
+    (0x0700, 0x074F, 'syr', True),   # 叙利亚文
+    (0x0750, 0x077F, 'ar', True),    # 阿拉伯文补充
+    (0x0780, 0x07BF, 'dv', True),    # 它拿文
+    (0x07C0, 0x07FF, 'nqo', True),   # 西非书面文字
+    (0x08A0, 0x08FF, 'ar', True),    # 阿拉伯文扩展
+    (0x0900, 0x097F, 'hi', False),   # 天城文
+    (0x0980, 0x09FF, 'bn', False),   # 孟加拉文
+    (0x0A00, 0x0A7F, 'pa', False),   # 古木基文
+    (0x0A80, 0x0AFF, 'gu', False),   # 古吉拉特文
+    (0x0B00, 0x0B7F, 'or', False),   # 奥里亚文
+    (0x0B80, 0x0BFF, 'ta', False),   # 泰米尔文
+    (0x0C00, 0x0C7F, 'te', False),   # 泰卢固文
+    (0x0C80, 0x0CFF, 'kn', False),   # 卡纳达文
+    (0x0D00, 0x0D7F, 'ml', False),   # 马拉雅拉姆文
+    (0x0D80, 0x0DFF, 'si', False),   # 僧伽罗文
+    (0x0E00, 0x0E7F, 'th', False),   # 泰文
+    (0x0E80, 0x0EFF, 'lo', False),   # 老挝文
+    (0x0F00, 0x0FFF, 'bo', False),   # 藏文
+    (0x1000, 0x109F, 'my', False),   # 缅甸文
+    (0x1780, 0x17FF, 'km', False),   # 高棉文
+    (0x1800, 0x18AF, 'mn', False),   # 蒙古文
+    (0xFB1D, 0xFB4F, 'he', True),    # 希伯来文表现形式
+    (0xFB50, 0xFDFF, 'ar', True),    # 阿拉伯文表现形式 A
+    (0xFE70, 0xFEFF, 'ar', True),    # 阿拉伯文表现形式 B
+)
+
+# 不属于特定语言、但同样需要整形的字符：组合附加符号、零宽连接符、变体选择符
+COMBINING_RANGES = (
+    (0x0300, 0x036F),
+    (0x1AB0, 0x1AFF),
+    (0x1DC0, 0x1DFF),
+    (0x200C, 0x200D),
+    (0x20D0, 0x20FF),
+    (0xFE00, 0xFE0F),
+    (0xFE20, 0xFE2F),
+)
+
+_COMPLEX_RE = re.compile('[' + ''.join(
+    f'\\U{start:08x}-\\U{end:08x}'
+    for start, end in [(s, e) for s, e, _, _ in COMPLEX_SCRIPTS] + list(COMBINING_RANGES)
+) + ']')
+
+# 排版方式：engine 为 Pillow 排版引擎，direction/language 仅在 RAQM 下传给 Pillow（BASIC 时为 None）
+TextShaping = namedtuple('TextShaping', ['engine', 'direction', 'language'])
+
+BASIC_SHAPING = TextShaping(ImageFont.Layout.BASIC, None, None)
+
+_warned_unavailable = False
+
+
+def detect_script(text):
+    """
+    找出文字中第一个需要整形的书写系统。
+
+    Args:
+        text (str): 文字
+
+    Returns:
+        tuple[str | None, bool] | None: (语言标签, 是否从右到左)；全部为简单文字时返回 None
+    """
+    if text.isascii():
+        return None
+    match = _COMPLEX_RE.search(text)
+    if match is None:
+        return None
+    language = None
+    rtl = False
+    for ch in text[match.start():]:
+        code = ord(ch)
+        for start, end, lang, is_rtl in COMPLEX_SCRIPTS:
+            if start <= code <= end:
+                language = language or lang
+                rtl = rtl or is_rtl
+                break
+    return language, rtl
+
+
+def shaping_for_text(text, policy='auto'):
+    """
+    为一行文字选择排版引擎、书写方向与语言。
+
+    Args:
+        text (str): 文字
+        policy (str): auto / basic / raqm
+
+    Returns:
+        TextShaping: 排版方式；当前 Pillow 不支持 RAQM 时始终回退 BASIC（并只警告一次）
+    """
+    global _warned_unavailable
+    if policy == 'basic':
+        return BASIC_SHAPING
+    script = detect_script(text)
+    if script is None and policy == 'auto':
+        return BASIC_SHAPING
+    if not RAQM_AVAILABLE:
+        if not _warned_unavailable:
+            logger.warning("当前 Pillow 未启用 RAQM（libraqm），复杂文字将以 BASIC 引擎排版，可能无法正确连写或显示方向")
+            _warned_unavailable = True
+        return BASIC_SHAPING
+    if script is None:
+        return TextShaping(ImageFont.Layout.RAQM, None, None)
+    language, rtl = script
+    return TextShaping(ImageFont.Layout.RAQM, 'rtl' if rtl else 'ltr', language)
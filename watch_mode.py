@@ -0,0 +1,233 @@
+"""
+监视模式
+长时间运行，轮询 ID 数据源、配置文件、字体与背景图片；检测到修改后只重新生成受影响的图片。
+字体句柄与背景模板在进程内保持加载，小范围修改可在一秒内反映到输出目录。
+"""
+
+import os
+import time
+import logging
+
+from id_fill_generator import IDFillGenerator
+from output_layout import write_output_index
+
+logger = logging.getLogger(__name__)
+
+# 渲染失败的行重试的最长间隔（秒）：首次在下一轮轮询时重试，连续失败时间隔逐次加倍
+MAX_RETRY_DELAY = 30
+
+
+def file_stamp(path):
+    """
+    获取文件的修改标记（修改时间与大小）。
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        tuple | None: (mtime_ns, size)；文件不存在时返回 None
+    """
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class BatchWatcher:
+    """监视输入文件变化并增量重新生成图片"""
+
+    def __init__(self, config_path='config.json', interval=0.5):
+        """
+        初始化监视器
+
+        Args:
+            config_path (str): 配置文件路径
+            interval (float): 轮询间隔（秒）
+        """
+        self.config_path = config_path
+        self.interval = interval
+        self.generator = IDFillGenerator(config_path)
+        self.stamps = {}
+        # 行编号 -> (渲染键, 输出文件名, 写出的全部输出路径)；渲染失败的行渲染键为 None
+        self.rendered = {}
+        # 行编号 -> 局部图块在背景中的区域（仅 output_mode=patch）
+        self.placements = {}
+        # 上次渲染失败、等待重试的行编号，以及下次重试的时间与当前重试间隔
+        self.pending = set()
+        self.retry_at = 0.0
+        self.retry_delay = interval
+
+    def watched_paths(self):
+        """
+        返回需要监视的文件列表：配置、ID 数据源、背景图片及所有样式档案使用的字体。
+
+        Returns:
+            list[str]: 文件路径列表
+        """
+        gen = self.generator
+        paths = [self.config_path, gen.excel_path, gen.background_path]
+        paths.extend(p.font_path for p in gen.profiles)
+        return list(dict.fromkeys(paths))
+
+    def poll(self):
+        """
+        检查监视文件的修改标记。
+
+        Returns:
+            set[str]: 自上次检查以来发生变化的文件路径
+        """
+        current = {path: file_stamp(path) for path in self.watched_paths()}
+        changed = {path for path, stamp in current.items() if self.stamps.get(path, ()) != stamp}
+        self.stamps = current
+        return changed
+
+    def apply_changes(self, changed):
+        """
+        根据变化的文件更新生成器状态（配置、模板与字体缓存）。
+
+        Args:
+            changed (set[str]): 变化的文件路径
+        """
+        gen = self.generator
+        if self.config_path in changed:
+            try:
+                gen.apply_config(gen.load_config(self.config_path))
+            except Exception as e:
+                logger.error(f"配置重新加载失败，继续使用上一次的有效配置: {e}")
+        if gen.background_path in changed:
+            gen._background = None
+        for profile in gen.profiles:
+            if profile.font_path in changed:
+                profile.clear_fonts()
+                gen._sizers.pop(profile.signature(), None)
+                gen._fitters.pop(profile.signature(), None)
+                gen._atlases.pop(profile.font_path, None)
+
+    def render_key(self, user_id, profile_index):
+        """
+        计算一行的渲染键；键不变则输出图片不变，无需重新生成。
+
+        Args:
+            user_id (str): 用户ID
+            profile_index (int): 样式档案索引
+
+        Returns:
+            tuple: 渲染键
+        """
+        gen = self.generator
+        profile = gen.profiles[profile_index]
+        return (
+            user_id,
+            profile.signature(),
+            self.stamps.get(profile.font_path),
+            gen.background_path,
+            self.stamps.get(gen.background_path),
+            tuple(v.signature() for v in gen.variants),
+            tuple(c.signature() for c in gen.color_variants),
+            gen.output_mode,
+            gen.patch_crop,
+            tuple(sorted(gen.text_fit.items())),
+            tuple(sorted(gen.glyph_atlas.items())),
+            os.path.abspath(gen.output_dir),
+        )
+
+    def sync(self):
+        """
+        对比当前输入与上次输出，只重新生成新增、修改或样式变化的行，并删除已失效的输出文件。
+
+        Returns:
+            int: 本次重新生成的图片数量
+        """
+        gen = self.generator
+        if gen.output_mode == 'imposition':
+            # 拼版页面由所有卡片共同组成，任意变化都整体重新拼版
+            self.rendered = {}
+            return gen.generate_all_images()
+        rows = gen.build_render_rows(gen.read_excel_data())
+        layout = gen.make_output_layout(len(rows))
+
+        current = {}
+        todo = []
+        for i, user_id, profile_index in rows:
+            key = self.render_key(user_id, profile_index)
+            filename = gen.build_output_filename(i, user_id, layout)
+            previous = self.rendered.get(i)
+            if previous is not None and previous[:2] == (key, filename):
+                current[i] = previous
+            else:
+                current[i] = (key, filename, tuple(gen.output_paths_for(filename)))
+                todo.append((i, user_id, profile_index, filename))
+
+        # 删除当前各行不再写出的旧输出（ID 被修改、删除，输出目录变化，或尺寸/颜色变体被移除）；
+        # 按每行实际写出时记录的路径删除，而不是按当前配置推算
+        live = {path for _, _, paths in current.values() for path in paths}
+        for _, _, paths in self.rendered.values():
+            for path in paths:
+                if path not in live:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+        failed = set()
+        font_sizes = gen.solve_font_sizes([(i, user_id, profile_index) for i, user_id, profile_index, _ in todo])
+        for i, user_id, profile_index, filename in todo:
+            try:
+                region = gen.create_id_image(user_id, filename, profile_index=profile_index,
+                                             font_size=font_sizes.get(i))
+                self.placements[i] = region
+            except Exception:
+                # 失败的行保留输出路径（便于之后删除）但不记录渲染键，由 run 在之后的轮询中重试
+                current[i] = (None,) + current[i][1:]
+                failed.add(i)
+        self.rendered = current
+        if failed:
+            # 首次失败在下一轮轮询时重试；连续失败时逐次加倍间隔，避免持续出错时刷屏
+            self.retry_delay = min(self.retry_delay * 2, MAX_RETRY_DELAY) if self.pending else self.interval
+            self.retry_at = time.monotonic() + self.retry_delay
+            logger.warning(f"{len(failed)} 行生成失败，{self.retry_delay:g}s 后重试")
+        self.pending = failed
+
+        if gen.output_mode == 'patch':
+            gen.write_patch_manifest(
+                (i, user_id, current[i][1], self.placements[i]) for i, user_id, _ in rows if i not in failed
+            )
+
+        if layout.index_file:
+            write_output_index(
+                os.path.join(gen.output_dir, layout.index_file),
+                ((i, user_id, current[i][1]) for i, user_id, _ in rows if i not in failed)
+            )
+        return len(todo)
+
+    def run(self):
+        """运行监视循环，直到用户按 Ctrl+C 终止"""
+        logger.info(f"监视模式已启动（轮询间隔 {self.interval}s），按 Ctrl+C 退出")
+        try:
+            # 首次全量生成；之后只处理变化
+            self.poll()
+            start = time.perf_counter()
+            count = self.sync()
+            logger.info(f"初始生成 {count} 张图片，耗时 {time.perf_counter() - start:.3f}s")
+            while True:
+                time.sleep(self.interval)
+                changed = self.poll()
+                retry = bool(self.pending) and time.monotonic() >= self.retry_at
+                if not changed and not retry:
+                    continue
+                start = time.perf_counter()
+                self.apply_changes(changed)
+                # 配置变化可能改变监视列表（例如更换字体或背景），同步刷新一次标记
+                extra = self.poll()
+                if extra:
+                    self.apply_changes(extra)
+                    changed |= extra
+                try:
+                    reason = f"检测到变化: {sorted(changed)}" if changed else f"重试上次失败的 {len(self.pending)} 行"
+                    count = self.sync()
+                    logger.info(f"{reason}；重新生成 {count} 张图片，耗时 {time.perf_counter() - start:.3f}s")
+                except Exception as e:
+                    logger.error(f"增量生成失败，等待下一次修改: {e}")
+        except KeyboardInterrupt:
+            logger.info("监视模式已退出")